@@ -12,13 +12,19 @@ from omni.isaac.core.prims import RigidPrim
 from omni.isaac.core.utils.stage import add_reference_to_stage
 from pxr import Gf, UsdPhysics
 import json
+import math
 import os
+import time
 import numpy as np
 
 # CONFIG
 CATALOG_FILE = "drone_catalog.json"
 USD_EXPORT_DIR = os.path.abspath("usd_export")
 
+# Demo hover bob: thrust += sin(t * BOB_OMEGA) * BOB_AMPLITUDE_N
+BOB_OMEGA = 2.0
+BOB_AMPLITUDE_N = 2.0
+
 def load_catalog():
     with open(CATALOG_FILE, "r") as f: return json.load(f)
 
@@ -62,6 +68,13 @@ def main():
     
     # Simple Controller State
     throttle = 0.0
+
+    # Hover Logic (Counteract Gravity)
+    # Force = Mass * Gravity
+    hover_force = mass_kg * 9.81
+
+    # One (1, 3) thrust buffer, rewritten in place every step
+    thrust_buf = np.zeros((1, 3), dtype=np.float32)
     
     print("🚀 ISAAC SIM LAUNCHED. Press PLAY in the Viewport.")
     
@@ -72,22 +85,17 @@ def main():
         # --- SIMPLE FLIGHT CONTROLLER LOGIC ---
         # (In a real app, integrate a PID controller here)
         
-        # Hover Logic (Counteract Gravity)
-        # Force = Mass * Gravity
-        hover_force = mass_kg * 9.81
-        
         # Apply Force to Center of Mass
         # Note: In Isaac, apply_force is global or local.
         # We want Local Z-Up force (Thrust).
         
         # Let's just make it hover + sine wave bobbing
-        import time
-        bob = math.sin(time.time() * 2) * 2.0
-        current_thrust = hover_force + bob
+        bob = math.sin(time.perf_counter() * BOB_OMEGA) * BOB_AMPLITUDE_N
         
         # Apply Force (Z-axis is index 2)
         # Apply at position (0,0,0) relative to body (COM)
-        drone.apply_forces(np.array([[0, 0, current_thrust]]), is_global=False)
+        thrust_buf[0, 2] = hover_force + bob
+        drone.apply_forces(thrust_buf, is_global=False)
         
         # Visuals: Rotate props? 
         # (Requires accessing Xformable of prop prims, omitted for brevity V1)
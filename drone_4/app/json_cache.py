@@ -0,0 +1,49 @@
+# FILE: app/json_cache.py
+import functools
+import json
+import os
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def read_json(path):
+    """json.load for a path, through orjson when it is installed."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # NaN / Infinity are accepted by json but not by orjson
+    return json.loads(raw)
+
+def dumps_json(data):
+    """Compact json.dumps equivalent, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=_ORJSON_OPTS).decode()
+    return json.dumps(data)
+
+def write_json(path, data):
+    """json.dump(data, f, indent=2) equivalent, through orjson when it is installed."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=_ORJSON_OPTS | orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+@functools.lru_cache(maxsize=8)
+def _load_json_cached(path, mtime_ns, size):
+    return read_json(path)
+
+def load_json_cached(path):
+    """
+    Parses a JSON file once per (path, mtime, size).
+    The returned object is shared between callers: treat it as read-only.
+    """
+    st = os.stat(path)
+    return _load_json_cached(path, st.st_mtime_ns, st.st_size)
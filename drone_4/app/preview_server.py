@@ -0,0 +1,30 @@
+# FILE: app/preview_server.py
+import gzip
+import http.server
+import os
+
+def zero_constant(_name):
+    """NaN / Infinity / -Infinity -> 0.0 (the browser's JSON.parse rejects them)."""
+    return 0.0
+
+def write_with_gzip(path, payload):
+    """Writes payload to path plus a precompressed path.gz for the preview server."""
+    with open(path, "wb") as f:
+        f.write(payload)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(payload, 6))
+
+class GzipHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the .gz written next to a generated file when the client accepts gzip."""
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if "gzip" in self.headers.get("Accept-Encoding", "") and os.path.isfile(path + ".gz"):
+            f = open(path + ".gz", "rb")
+            self.send_response(200)
+            self.send_header("Content-Type", self.guess_type(path))
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return f
+        return super().send_head()
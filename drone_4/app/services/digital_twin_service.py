@@ -1,7 +1,23 @@
 # FILE: app/services/digital_twin_service.py
-import math
+import copy
+import functools
 import json
+import numbers
 import re
+from collections import defaultdict
+
+import numpy as np
+
+# Stand-in for BOM categories that were not sourced. Shared, never mutated.
+_EMPTY_PART = {"specs": {}, "visuals": None, "model_name": ""}
+
+_FLOAT_RE = re.compile(r"(\d+(\.\d+)?)")
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+
+# Layout ratios as reciprocals so the hot path multiplies instead of divides
+_HALF = 0.5
+_INV_2_5 = 1.0 / 2.5 # Frame core length vs wheelbase
+_INV_3_5 = 1.0 / 3.5 # FPV camera forward offset vs wheelbase
 
 def _extract_float(value, default=0.0):
     """
@@ -9,11 +25,21 @@ def _extract_float(value, default=0.0):
     Ex: "327mm" -> 327.0
     Ex: "approx 5.5 inches" -> 5.5
     """
+    # Exact type checks: most spec fields are already numeric, and bools
+    # (an int subclass) should not pass as measurements.
+    t = type(value)
+    if t is float: return value
+    if t is int: return float(value)
     if value is None: return default
-    if isinstance(value, (int, float)): return float(value)
-    
-    # Find first integer or float
-    match = re.search(r"(\d+(\.\d+)?)", str(value))
+    if t is str:
+        match = _FLOAT_RE.search(value)
+    elif isinstance(value, numbers.Real) and not isinstance(value, bool):
+        # numpy scalars and other numeric subclasses: str() may be
+        # exponent notation ("1e-05") that the pattern below misreads
+        return float(value)
+    else:
+        # Find first integer or float
+        match = _FLOAT_RE.search(str(value))
     if match:
         return float(match.group(1))
     return default
@@ -22,74 +48,100 @@ def _parse_dimensions_string(value):
     """
     Parses "20x20x10" or "30.5*30.5" into [L, W, H].
     """
-    if not value: return [0, 0, 0]
-    s = str(value).lower()
-    # Normalize separators
-    s = s.replace('*', ' ').replace('x', ' ').replace('/', ' ').replace(',', ' ').replace('mm', '')
-    
-    # Extract all numbers
-    nums = [float(m.group()) for m in re.finditer(r"\d+(\.\d+)?", s)]
+    if not value: return [0.0, 0.0, 0.0]
+    # Separators and units are never digits, so one number scan is enough
+    nums = [float(n) for n in _NUM_RE.findall(str(value))[:3]]
     
     # Pad to at least 3 values [L, W, H]
     while len(nums) < 3: nums.append(0.0)
-    return nums[:3]
+    return nums
 
-def generate_environment_config(mission_profile):
-    """Decides which 'Game Level' to load."""
-    mission_name = str(mission_profile.get("mission_name", "")).lower()
-    primary_goal = str(mission_profile.get("primary_goal", "")).lower()
-    
-    env = {
+# 'Game Levels' the renderer knows how to build. Callers get a deep copy.
+_ENV_TEMPLATES = {
+    "LAB": {
         "type": "LAB",
         "sky_color": "#050505", 
         "ground_color": "#111111", 
         "obstacles": []
-    }
-
-    if any(x in mission_name or x in primary_goal for x in ["ranch", "farm", "cattle", "fence", "brush"]):
-        env["type"] = "RANCH"
-        env["sky_color"] = "#87CEEB"
-        env["ground_color"] = "#2d4c1e"
-        env["obstacles"] = [
+    },
+    "RANCH": {
+        "type": "RANCH",
+        "sky_color": "#87CEEB",
+        "ground_color": "#2d4c1e",
+        "obstacles": [
             {"type": "TREE", "count": 30, "spread_radius": 80},
             {"type": "FENCE", "count": 1, "length": 50}
         ]
-    elif any(x in mission_name or x in primary_goal for x in ["urban", "city", "police"]):
-        env["type"] = "CITY"
-        env["sky_color"] = "#2c3e50"
-        env["ground_color"] = "#222222"
-        env["obstacles"] = [{"type": "BUILDING", "count": 8, "spread_radius": 60}]
+    },
+    "CITY": {
+        "type": "CITY",
+        "sky_color": "#2c3e50",
+        "ground_color": "#222222",
+        "obstacles": [{"type": "BUILDING", "count": 8, "spread_radius": 60}]
+    },
+}
 
-    return env
+@functools.lru_cache(maxsize=64)
+def _env_for(mission_name, primary_goal):
+    """Keyword-scans the mission text once per distinct (name, goal) pair."""
+    if any(x in mission_name or x in primary_goal for x in ["ranch", "farm", "cattle", "fence", "brush"]):
+        return "RANCH"
+    if any(x in mission_name or x in primary_goal for x in ["urban", "city", "police"]):
+        return "CITY"
+    return "LAB"
 
-def generate_scene_graph(mission_profile, bom):
+def generate_environment_config(mission_profile):
+    """Decides which 'Game Level' to load."""
+    mission_name = str(mission_profile.get("mission_name", "")).lower()
+    primary_goal = str(mission_profile.get("primary_goal", "")).lower()
+    return copy.deepcopy(_ENV_TEMPLATES[_env_for(mission_name, primary_goal)])
+
+def _measure_bom(bom):
     """
-    Calculates the detailed 3D Assembly Graph using refined specs.
+    Resolves the key parts of a BOM and extracts their critical dimensions.
     """
     # 1. Identify Key Components
-    parts = {p['category']: p for p in bom}
-    frame = parts.get('Frame_Kit', {})
-    motors = parts.get('Motors', {})
-    props = parts.get('Propellers', {})
-    battery = parts.get('Battery', {})
-    stack = parts.get('FC_Stack', {})
-    camera = parts.get('Camera_VTX_Kit') or parts.get('Camera_Payload', {})
+    parts = defaultdict(lambda: _EMPTY_PART)
+    parts.update({p['category']: p for p in bom})
+    frame = parts['Frame_Kit']
+    motors = parts['Motors']
+    props = parts['Propellers']
+    battery = parts['Battery']
+    stack = parts['FC_Stack']
+    camera = parts['Camera_VTX_Kit'] if 'Camera_VTX_Kit' in parts else parts['Camera_Payload']
+
+    # Bind specs once; share one empty dict as the missing-key default.
+    # Spec lookups below index directly and catch KeyError (EAFP): on the
+    # common hit path that is a single subscript instead of a .get() call.
+    _E = {}
+    frame_specs = frame.get('specs') or _E
+    motor_specs = motors.get('specs') or _E
+    prop_specs = props.get('specs') or _E
+    bat_specs = battery.get('specs') or _E
 
     # 2. Extract Critical Dimensions (Smart Logic)
     
     # --- FRAME ---
     # Try wheelbase_mm, then fallback to converting inches (e.g. "7 inch")
-    wheelbase = _extract_float(frame.get('specs', {}).get('wheelbase_mm'))
+    try:
+        wheelbase = _extract_float(frame_specs['wheelbase_mm'])
+    except KeyError:
+        wheelbase = 0.0
     if wheelbase == 0:
         # Fallback: Try to guess from model name or max prop
-        max_prop = _extract_float(frame.get('specs', {}).get('max_prop_size_inch'))
+        try:
+            max_prop = _extract_float(frame_specs['max_prop_size_inch'])
+        except KeyError:
+            max_prop = 0.0
         if max_prop > 0: wheelbase = max_prop * 25.4 * 2.2 # Rough approximation
         else: wheelbase = 225.0 # Standard 5" default
 
     # --- MOTORS ---
     # Parse stator size (e.g. "2306") into physical dimensions
-    motor_specs = motors.get('specs', {})
-    stator = str(motor_specs.get('stator_size', ''))
+    try:
+        stator = str(motor_specs['stator_size'])
+    except KeyError:
+        stator = ''
     
     motor_w = 28.0 # Default
     motor_h = 15.0
@@ -103,133 +155,219 @@ def generate_scene_graph(mission_profile, bom):
         motor_h = s_h + 10 # Bell + Base
     
     # --- PROPS ---
-    prop_diam_inch = _extract_float(props.get('specs', {}).get('diameter_inches'))
+    try:
+        prop_diam_inch = _extract_float(prop_specs['diameter_inches'])
+    except KeyError:
+        prop_diam_inch = 0.0
     if prop_diam_inch == 0:
         # Try mm
-        prop_diam_mm = _extract_float(props.get('specs', {}).get('diameter_mm'))
+        try:
+            prop_diam_mm = _extract_float(prop_specs['diameter_mm'])
+        except KeyError:
+            prop_diam_mm = 0.0
         if prop_diam_mm > 0:
-            prop_radius_mm = prop_diam_mm / 2
+            prop_radius_mm = prop_diam_mm * _HALF
         else:
             prop_radius_mm = 127.0 / 2 # Default 5"
     else:
-        prop_radius_mm = (prop_diam_inch * 25.4) / 2
+        prop_radius_mm = (prop_diam_inch * 25.4) * _HALF
 
     # --- BATTERY ---
     # Parse "L x W x H" string from refinery
-    bat_dim_str = battery.get('specs', {}).get('dimensions_mm')
+    try:
+        bat_dim_str = bat_specs['dimensions_mm']
+    except KeyError:
+        bat_dim_str = None
     bat_L, bat_W, bat_H = _parse_dimensions_string(bat_dim_str)
     if bat_L == 0: 
         # Fallback based on cell count
-        cells = _extract_float(battery.get('specs', {}).get('cell_count_s'), 6)
+        try:
+            cells = _extract_float(bat_specs['cell_count_s'], 6)
+        except KeyError:
+            cells = 6
         bat_L, bat_W, bat_H = 75, 35, (10 * cells)
 
-    # 3. Calculate Geometry
-    arm_radius = wheelbase / 2 
-    dx = arm_radius * 0.7071 # Cos(45)
-    dy = arm_radius * 0.7071 # Sin(45)
+    # --- CAMERA ---
+    # Parse camera dimensions if available, else default
+    cam_w = 19.0 # Micro size
+    if "mini" in str(camera.get('model_name', '')).lower(): cam_w = 22.0
+
+    # Intern visuals by content: identical dicts share one table slot and
+    # components carry an integer "visuals_id" instead of a copy.
+    visuals_table = []
+    slots = {}
+    def _intern(vis):
+        if vis is None: return None
+        key = json.dumps(vis, sort_keys=True)
+        if key not in slots:
+            slots[key] = len(visuals_table)
+            visuals_table.append(vis)
+        return slots[key]
+
+    return {
+        "wheelbase": wheelbase,
+        "motor_w": motor_w,
+        "motor_h": motor_h,
+        "prop_radius_mm": prop_radius_mm,
+        "bat_L": bat_L, "bat_W": bat_W, "bat_H": bat_H,
+        "cam_w": cam_w,
+        "frame_vis": _intern(frame.get("visuals")),
+        "motors_vis": _intern(motors.get("visuals")),
+        "props_vis": _intern(props.get("visuals")),
+        "stack_vis": _intern(stack.get("visuals")),
+        "battery_vis": _intern(battery.get("visuals")),
+        "camera_vis": _intern(camera.get("visuals")),
+        "visuals_table": visuals_table,
+        "total_weight_est_g": sum([_extract_float((i.get('specs') or _E).get('weight_g')) for i in bom]),
+    }
+
+def _build_components(m, motor_xs, motor_zs, arm_lens, angles):
+    """
+    Lays out the 3D components from measured dimensions and per-quadrant
+    motor positions / arm geometry (4 entries each).
+    """
+    wheelbase = m["wheelbase"]
+    motor_w = m["motor_w"]
+    motor_h = m["motor_h"]
+    bat_H = m["bat_H"]
+    frame_vis = m["frame_vis"]
+    motors_vis = m["motors_vis"]
+    props_vis = m["props_vis"]
 
-    components = []
+    # Fixed layout: frame core, 4x (arm, motor, prop), stack, battery, camera
+    components = [None] * 16
 
     # --- FRAME CORE ---
-    components.append({
+    components[0] = {
         "id": "frame_core",
         "type": "FRAME_CORE",
-        "visuals": frame.get("visuals"),
-        "dims": {"length": wheelbase/2.5, "width": 45, "thickness": 4},
+        "visuals_id": frame_vis,
+        "dims": {"length": wheelbase * _INV_2_5, "width": 45, "thickness": 4},
         "pos": [0, 0, 0],
         "rot": [0, 0, 0]
-    })
+    }
 
     # --- ARMS & MOTORS & PROPS ---
-    quadrants = [[1, 1], [-1, 1], [-1, -1], [1, -1]]
+    idx = 1
     
-    for i, (sx, sy) in enumerate(quadrants):
-        motor_x = sx * dx
-        motor_z = sy * dy
-        
-        # Arm
-        arm_len = math.sqrt(motor_x**2 + motor_z**2)
-        angle_rad = math.atan2(motor_z, motor_x) # Correct rotation calculation
+    for i in range(4):
+        motor_x = motor_xs[i]
+        motor_z = motor_zs[i]
         
         # In Three.js, rotation order matters. We want the arm pointing to the motor.
         # We rotate around Y axis (Up).
         
-        components.append({
+        components[idx] = {
             "id": f"arm_{i+1}",
             "type": "FRAME_ARM",
-            "visuals": frame.get("visuals"),
-            "dims": {"length": arm_len, "width": 12, "thickness": 5},
+            "visuals_id": frame_vis,
+            "dims": {"length": arm_lens[i], "width": 12, "thickness": 5},
             "pos": [0, 0, 0], 
-            "rot": [0, -angle_rad, 0] 
-        })
+            "rot": [0, -angles[i], 0] 
+        }
 
         # Motor
-        motor_y = 2 + (motor_h/2)
-        components.append({
+        components[idx + 1] = {
             "id": f"motor_{i+1}",
             "type": "MOTOR",
-            "visuals": motors.get("visuals"),
-            "dims": {"radius": motor_w/2, "height": motor_h},
+            "visuals_id": motors_vis,
+            "dims": {"radius": motor_w * _HALF, "height": motor_h},
             "pos": [motor_x, 2, motor_z],
             "rot": [0, 0, 0]
-        })
+        }
 
         # Prop
         prop_y = 2 + motor_h + 2 
-        components.append({
+        components[idx + 2] = {
             "id": f"prop_{i+1}",
             "type": "PROPELLER",
-            "visuals": props.get("visuals"),
-            "dims": {"radius": prop_radius_mm},
+            "visuals_id": props_vis,
+            "dims": {"radius": m["prop_radius_mm"]},
             "pos": [motor_x, prop_y, motor_z],
             "rot": [0, 0, 0],
             "is_dynamic": True
-        })
+        }
+        idx += 3
 
     # --- STACK ---
     stack_h = 15.0
-    components.append({
+    components[13] = {
         "id": "stack",
         "type": "PCB_STACK",
-        "visuals": stack.get("visuals"),
+        "visuals_id": m["stack_vis"],
         "dims": {"width": 30.5, "length": 30.5, "height": stack_h},
         "pos": [0, 6, 0],
         "rot": [0, 0, 0]
-    })
+    }
 
     # --- BATTERY ---
-    components.append({
+    components[14] = {
         "id": "battery",
         "type": "BATTERY",
-        "visuals": battery.get("visuals"),
-        "dims": {"length": bat_L, "width": bat_W, "height": bat_H},
-        "pos": [0, 6 + stack_h + 5 + (bat_H/2), 0],
+        "visuals_id": m["battery_vis"],
+        "dims": {"length": m["bat_L"], "width": m["bat_W"], "height": bat_H},
+        "pos": [0, 6 + stack_h + 5 + (bat_H * _HALF), 0],
         "rot": [0, 0, 0]
-    })
+    }
 
     # --- CAMERA ---
-    # Parse camera dimensions if available, else default
-    cam_w = 19.0 # Micro size
-    if "mini" in str(camera.get('model_name', '')).lower(): cam_w = 22.0
-    
-    components.append({
+    components[15] = {
         "id": "fpv_cam",
         "type": "CAMERA",
-        "visuals": camera.get("visuals"),
-        "dims": {"width": cam_w},
-        "pos": [0, 10, wheelbase/3.5], # Offset forward based on frame size
+        "visuals_id": m["camera_vis"],
+        "dims": {"width": m["cam_w"]},
+        "pos": [0, 10, wheelbase * _INV_3_5], # Offset forward based on frame size
         "rot": [0, 0, 0]
-    })
+    }
 
+    return components
+
+def _scene(mission_profile, m, components):
     # --- GENERATE ENVIRONMENT ---
     # FIX: Explicitly call the function here
     env = generate_environment_config(mission_profile)
 
     return {
         "environment": env,
+        "visuals_table": m["visuals_table"],
         "components": components,
         "meta": {
-            "total_weight_est_g": sum([_extract_float(i.get('specs', {}).get('weight_g')) for i in bom]),
-            "wheelbase": wheelbase
+            "total_weight_est_g": m["total_weight_est_g"],
+            "wheelbase": m["wheelbase"]
         }
-    }
\ No newline at end of file
+    }
+
+# Quadrant signs (x, z) for the four motors: FR, FL, RL, RR
+_QUAD_SX = np.array([1, -1, -1, 1], dtype=float)
+_QUAD_SZ = np.array([1, 1, -1, -1], dtype=float)
+
+def generate_scene_graph(mission_profile, bom):
+    """
+    Calculates the detailed 3D Assembly Graph using refined specs.
+    """
+    return generate_scene_graph_batch([mission_profile], [bom])[0]
+
+def generate_scene_graph_batch(mission_profiles, boms):
+    """
+    Batch variant of generate_scene_graph for design-space sweeps.
+    Motor positions and arm geometry for all N configs are computed as
+    (N, 4) arrays in one pass instead of 4N scalar evaluations.
+    """
+    measured = [_measure_bom(bom) for bom in boms]
+    if not measured:
+        return []
+
+    wheelbases = np.array([m["wheelbase"] for m in measured], dtype=float)
+    dx = (wheelbases * _HALF) * 0.7071
+    motor_x = np.outer(dx, _QUAD_SX)
+    motor_z = np.outer(dx, _QUAD_SZ)
+    arm_len = np.hypot(motor_x, motor_z)
+    angle = np.arctan2(motor_z, motor_x)
+
+    scenes = []
+    for n, (profile, m) in enumerate(zip(mission_profiles, measured)):
+        components = _build_components(
+            m, motor_x[n].tolist(), motor_z[n].tolist(), arm_len[n].tolist(), angle[n].tolist()
+        )
+        scenes.append(_scene(profile, m, components))
+    return scenes
@@ -41,6 +41,8 @@ class IsaacService:
 
         # 4. Construct Geometry from Scene Graph
         scene_graph = drone['technical_data']['scene_graph']
+        # Components reference shared visuals by index into the visuals table
+        visuals_table = scene_graph.get('visuals_table', [])
         
         for i, comp in enumerate(scene_graph['components']):
             comp_type = comp['type']
@@ -72,7 +74,8 @@ class IsaacService:
             xform.AddRotateXYZOp().Set(Gf.Vec3d(*rot_deg))
 
             # Apply Material / Color
-            self._apply_material(stage, mesh, comp.get('visuals'))
+            vis_id = comp.get('visuals_id')
+            self._apply_material(stage, mesh, visuals_table[vis_id] if vis_id is not None else comp.get('visuals'))
 
         # 5. Save
         stage.GetRootLayer().Save()
@@ -1,7 +1,6 @@
 # FILE: app/services/supply_service.py
-import json
-import os
 import difflib
+from app.json_cache import load_json_cached
 
 ARSENAL_FILE = "drone_arsenal.json"
 
@@ -10,14 +9,11 @@ class SupplyService:
         self.inventory = self._load_inventory()
 
     def _load_inventory(self):
-        if os.path.exists(ARSENAL_FILE):
-            try:
-                with open(ARSENAL_FILE, "r") as f:
-                    data = json.load(f)
-                    return data.get("components", [])
-            except: 
-                pass
-        return []
+        try:
+            # Shared parse: SupplyService only reads the inventory
+            return load_json_cached(ARSENAL_FILE).get("components", [])
+        except (FileNotFoundError, ValueError):
+            return []
 
     def find_part(self, category, ideal_model_name):
         """
@@ -25,26 +21,30 @@ class SupplyService:
         If verified part exists: Returns it.
         If not: Returns a 'Generic' placeholder (so the code doesn't crash).
         """
-        # Filter by category
-        candidates = [p for p in self.inventory if p.get('category') == category]
+        # Single sweep: filter by category and index candidates by lowercased
+        # name (first occurrence wins, matching the old scan order)
+        target = ideal_model_name.lower()
+        by_lower = {}
+        for p in self.inventory:
+            if p.get('category') == category:
+                by_lower.setdefault(p['model_name'].lower(), p)
         
-        if not candidates:
+        if not by_lower:
             return self._get_generic_fallback(category)
 
         # 1. Exact Match
-        for part in candidates:
-            if part['model_name'].lower() == ideal_model_name.lower():
-                return part
+        exact = by_lower.get(target)
+        if exact is not None:
+            return exact
 
         # 2. Fuzzy Match (Find closest string)
-        model_names = [p['model_name'] for p in candidates]
-        matches = difflib.get_close_matches(ideal_model_name, model_names, n=1, cutoff=0.4)
+        matches = difflib.get_close_matches(target, by_lower.keys(), n=1, cutoff=0.4)
         
         if matches:
-            return next(p for p in candidates if p['model_name'] == matches[0])
+            return by_lower[matches[0]]
 
         # 3. Fallback: Return the first verified part in that category
-        return candidates[0]
+        return next(iter(by_lower.values()))
 
     def _get_generic_fallback(self, category):
         """Generates a dummy part if the Arsenal is empty."""
@@ -1,13 +1,86 @@
 import json
+import os
+import ijson
+
 FILE = "drone_arsenal.json"
-with open(FILE, "r") as f:
-    data = json.load(f)
+TMP_FILE = FILE + ".tmp"
+
+def _build(first, events):
+    """Assembles one JSON value from the parser events, starting at `first`."""
+    builder = ijson.ObjectBuilder()
+    depth = 0
+    event = first
+    while True:
+        _, kind, value = event
+        builder.event(kind, value)
+        if kind in ("start_map", "start_array"):
+            depth += 1
+        elif kind in ("end_map", "end_array"):
+            depth -= 1
+        if depth == 0:
+            return builder.value
+        event = next(events)
 
-# Keep only items that have a model_name
-valid_items = [x for x in data['components'] if 'model_name' in x]
+def _stream_filter(f, out):
+    """
+    Streams components one at a time so peak memory stays at a single item.
+    Other top-level keys are copied through in order; output matches
+    json.dump(data, indent=2). Returns the number of items removed.
+    """
+    removed = 0
+    events = ijson.parse(f, use_float=True)
+    next(events) # ('', 'start_map', None)
+    out.write("{")
+    n_keys = 0
+    for _, kind, key in events:
+        if kind == "end_map": # end of the top-level object
+            break
+        out.write(("," if n_keys else "") + "\n  " + json.dumps(key) + ": ")
+        n_keys += 1
+        first = next(events)
+        if key != "components" or first[1] != "start_array":
+            out.write(json.dumps(_build(first, events), indent=2).replace("\n", "\n  "))
+            continue
+
+        out.write("[")
+        n_items = 0
+        for event in events:
+            if event[1] == "end_array":
+                break
+            item = _build(event, events)
+            # Keep only items that have a model_name
+            if 'model_name' not in item:
+                removed += 1
+                continue
+            body = json.dumps(item, indent=2).replace("\n", "\n    ")
+            out.write(("," if n_items else "") + "\n    " + body)
+            n_items += 1
+        out.write("\n  ]" if n_items else "]")
+    out.write("\n}" if n_keys else "}")
+    return removed
+
+def _load_filter(f, out):
+    """Whole-file path, for arsenals ijson rejects (NaN / Infinity written by json.dump)."""
+    data = json.load(f)
+    # Keep only items that have a model_name
+    valid_items = [x for x in data['components'] if 'model_name' in x]
+    removed = len(data['components']) - len(valid_items)
+    data['components'] = valid_items
+    json.dump(data, out, indent=2)
+    return removed
 
-print(f"Removed {len(data['components']) - len(valid_items)} malformed items.")
-data['components'] = valid_items
+# Survivors go to a temp file that atomically replaces the original
+try:
+    try:
+        with open(FILE, "rb") as f, open(TMP_FILE, "w") as out:
+            removed = _stream_filter(f, out)
+    except ijson.JSONError:
+        with open(FILE, "r") as f, open(TMP_FILE, "w") as out:
+            removed = _load_filter(f, out)
+except BaseException:
+    # Never leave a half-written temp file behind
+    if os.path.exists(TMP_FILE): os.remove(TMP_FILE)
+    raise
 
-with open(FILE, "w") as f:
-    json.dump(data, f, indent=2)
+os.replace(TMP_FILE, FILE)
+print(f"Removed {removed} malformed items.")
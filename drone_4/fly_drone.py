@@ -2,12 +2,14 @@
 import json
 import os
 import http.server
-import socketserver
 import webbrowser
-import math
+from app.json_cache import dumps_json
+from app.preview_server import GzipHandler, write_with_gzip, zero_constant
 
 CATALOG_FILE = "drone_catalog.json"
 OUTPUT_HTML = "dashboard.html"
+OUTPUT_WORKER = "physics_worker.js"
+OUTPUT_FLEET = "fleet_data.json"
 
 TEMPLATE = """
 <!DOCTYPE html>
@@ -60,7 +62,7 @@ TEMPLATE = """
         
         #fpv-overlay {
             position: absolute; top: 0; left: 0; width: 100%; height: 100%; pointer-events: none;
-            display: none;
+            visibility: hidden;
             background: radial-gradient(circle, transparent 40%, rgba(0,0,0,0.8) 100%);
             box-shadow: inset 0 0 100px rgba(0,0,0,0.9);
         }
@@ -78,8 +80,7 @@ TEMPLATE = """
       {
         "imports": {
           "three": "https://unpkg.com/three@0.160.0/build/three.module.js",
-          "three/addons/": "https://unpkg.com/three@0.160.0/examples/jsm/",
-          "cannon-es": "https://unpkg.com/cannon-es@0.20.0/dist/cannon-es.js"
+          "three/addons/": "https://unpkg.com/three@0.160.0/examples/jsm/"
         }
       }
     </script>
@@ -130,62 +131,137 @@ TEMPLATE = """
     import { RenderPass } from 'three/addons/postprocessing/RenderPass.js';
     import { UnrealBloomPass } from 'three/addons/postprocessing/UnrealBloomPass.js';
     import { OutputPass } from 'three/addons/postprocessing/OutputPass.js';
-    import * as CANNON from 'cannon-es';
 
-    const fleet = __FLEET_DATA__; 
+    // Fleet data ships as its own JSON file: parsed by the JSON parser
+    // rather than compiled as script source, and cached apart from the page
+    const fleet = await fetch('__FLEET_URL__').then(r => r.json());
 
     // --- TEXTURES ---
-    function createNoiseTexture(color1, color2, scale=1) {
-        const c = document.createElement('canvas');
-        c.width = 1024; c.height = 1024; // High Res
-        const ctx = c.getContext('2d');
-        const grd = ctx.createLinearGradient(0,0,1024,1024);
-        grd.addColorStop(0, color1);
-        grd.addColorStop(1, color2);
-        ctx.fillStyle = grd;
-        ctx.fillRect(0,0,1024,1024);
-        
-        // Detailed Noise
-        for(let i=0; i<30000; i++) {
-            const v = Math.random();
-            ctx.fillStyle = v > 0.5 ? 'rgba(255,255,255,0.03)' : 'rgba(0,0,0,0.05)';
-            const r = Math.random() * 2 * scale;
-            ctx.beginPath();
-            ctx.arc(Math.random()*1024, Math.random()*1024, r, 0, 6);
-            ctx.fill();
+    // Procedural ground/bark textures are baked once on the GPU: a fullscreen
+    // quad renders tileable value-noise plus speckle into a render target.
+    const NOISE_VERT = `
+        varying vec2 vUv;
+        void main() { vUv = uv; gl_Position = vec4(position.xy, 0.0, 1.0); }
+    `;
+    const NOISE_FRAG = `
+        uniform vec3 color1;
+        uniform vec3 color2;
+        uniform float scale;
+        varying vec2 vUv;
+
+        float hash(vec2 p) { return fract(sin(dot(p, vec2(127.1, 311.7))) * 43758.5453); }
+
+        // Value noise whose lattice wraps at 'period' so the texture tiles
+        float vnoise(vec2 p, float period) {
+            vec2 i = floor(p); vec2 f = fract(p);
+            vec2 u = f * f * (3.0 - 2.0 * f);
+            float a = hash(mod(i, period));
+            float b = hash(mod(i + vec2(1.0, 0.0), period));
+            float c = hash(mod(i + vec2(0.0, 1.0), period));
+            float d = hash(mod(i + vec2(1.0, 1.0), period));
+            return mix(mix(a, b, u.x), mix(c, d, u.x), u.y);
+        }
+
+        void main() {
+            vec3 col = mix(color1, color2, (vUv.x + vUv.y) * 0.5);
+
+            float n = 0.0, amp = 0.5, freq = 8.0;
+            for (int o = 0; o < 4; o++) { n += amp * vnoise(vUv * freq, freq); freq *= 2.0; amp *= 0.5; }
+            col *= 0.9 + 0.2 * n;
+
+            // Sparse light/dark grains, sized like the old canvas dots
+            vec2 cell = floor(vUv * (512.0 / scale));
+            float h = hash(cell + 17.0);
+            if (h < 0.15) col = mix(col, vec3(1.0), 0.03);
+            else if (h < 0.35) col = mix(col, vec3(0.0), 0.05);
+
+            gl_FragColor = vec4(col, 1.0);
         }
-        const tex = new THREE.CanvasTexture(c);
-        tex.wrapS = tex.wrapT = THREE.RepeatWrapping;
-        return tex;
+    `;
+
+    function bakeNoiseTexture(color1, color2, scale=1, size=1024) {
+        const rt = new THREE.WebGLRenderTarget(size, size, {
+            type: THREE.UnsignedByteType,
+            wrapS: THREE.RepeatWrapping, wrapT: THREE.RepeatWrapping,
+            minFilter: THREE.LinearMipmapLinearFilter, generateMipmaps: true
+        });
+        // Raw palette values, matching how the old canvas bytes were sampled
+        const mat = new THREE.ShaderMaterial({
+            uniforms: {
+                color1: { value: new THREE.Color().setStyle(color1, THREE.LinearSRGBColorSpace) },
+                color2: { value: new THREE.Color().setStyle(color2, THREE.LinearSRGBColorSpace) },
+                scale: { value: scale }
+            },
+            vertexShader: NOISE_VERT, fragmentShader: NOISE_FRAG,
+            depthTest: false, depthWrite: false, toneMapped: false
+        });
+        const quadScene = new THREE.Scene();
+        const quad = new THREE.Mesh(new THREE.PlaneGeometry(2, 2), mat);
+        quadScene.add(quad);
+        renderer.setRenderTarget(rt);
+        renderer.render(quadScene, new THREE.OrthographicCamera(-1, 1, 1, -1, 0, 1));
+        renderer.setRenderTarget(null);
+        quad.geometry.dispose(); mat.dispose();
+        return rt.texture;
     }
     
-    // More Realistic Palettes
-    const TEX_GRASS = createNoiseTexture('#1a2615', '#24381e'); // Darker, more contrast
-    const TEX_DIRT = createNoiseTexture('#3e3228', '#2a2119');
-    const TEX_BARK = createNoiseTexture('#1b110e', '#0f0907', 2);
+    // More Realistic Palettes (baked in init() once the renderer exists)
+    let TEX_GRASS, TEX_BARK;
 
     // --- ENGINE ---
-    let scene, camera, renderer, composer, world, clock;
-    let droneBody, droneMesh, droneProps = [];
+    let scene, camera, renderer, composer, clock;
+    let droneMesh, droneProps = [];
     let sunLight;
+    // Shadow frustum follows the drone, re-centred after 10 m of drift
+    const SHADOW_HALF_EXTENT = 80;
+    const SHADOW_RECENTRE_SQ = 10 * 10;
+    const shadowCentre = new THREE.Vector3(Infinity, 0, 0);
     let controls;
     let camMode = 'chase'; 
     let input = { thrust: 0, pitch: 0, roll: 0, yaw: 0 };
     let currentDrone = null;
     let isGameActive = false;
-    let currentThrottle = 0.0;
-    const CEILING_HEIGHT = 200.0;
     const PENDULUM_OFFSET = 0.2; 
 
+    // --- HUD ---
+    // Module scripts run after parsing, so the elements can be cached once.
+    // Gauges refresh at 10 Hz and only write text when the value changed.
+    const hudAlt = document.getElementById('hud-alt');
+    const hudSpd = document.getElementById('hud-spd');
+    const hudThr = document.getElementById('hud-thr');
+    const camDisp = document.getElementById('cam-mode-disp');
+    const fpvOverlay = document.getElementById('fpv-overlay');
+    const HUD_INTERVAL = 0.1;
+    let hudTimer = 0;
+    let lastAlt = null, lastSpd = null, lastThr = null;
+    // HiDPI cap: 3x displays would otherwise shade 9x the CSS-pixel fragments
+    const MAX_PIXEL_RATIO = 1.5;
+    const cappedPixelRatio = () => Math.min(window.devicePixelRatio, MAX_PIXEL_RATIO);
+
+    // --- PHYSICS WORKER ---
+    // Cannon-ES runs in physics_worker.js. The drone state it publishes is
+    // read from a SharedArrayBuffer when the page is cross-origin isolated,
+    // otherwise it arrives by postMessage after each step.
+    // Layout (Float32): pos xyz, quat xyzw, speed m/s, throttle 0..1
+    const STATE_LEN = 9;
+    const stateBuffer = self.crossOriginIsolated ? new SharedArrayBuffer(STATE_LEN * 4) : null;
+    const droneState = new Float32Array(stateBuffer || STATE_LEN);
+    const physicsWorker = new Worker('physics_worker.js', { type: 'module' });
+    if (!stateBuffer) physicsWorker.onmessage = (e) => droneState.set(e.data);
+    const treeColliders = [];
+    const cowColliders = [];
+    // Render-loop scratch objects (reused every frame)
+    const _bodyQuat = new THREE.Quaternion();
+    const _offset = new THREE.Vector3();
+    const _camOff = new THREE.Vector3();
+    const _fpvPos = new THREE.Vector3();
+
     window.startGame = function() {
-        document.getElementById('start-screen').style.display = 'none';
+        // Remove rather than hide: the blurred full-screen layer would
+        // otherwise stay composited behind the canvas on some drivers
+        document.getElementById('start-screen')?.remove();
         isGameActive = true;
-        if(droneBody) {
-            droneBody.wakeUp();
-            droneBody.position.set(0, 1.0, 0);
-            droneBody.velocity.set(0,0,0);
-            droneBody.quaternion.set(0,0,0,1);
-        }
+        physicsWorker.postMessage({ type: 'start' });
     };
 
     function init() {
@@ -195,25 +271,46 @@ TEMPLATE = """
 
         renderer = new THREE.WebGLRenderer({ antialias: false, powerPreference: "high-performance" });
         renderer.setSize(window.innerWidth, window.innerHeight);
-        renderer.setPixelRatio(window.devicePixelRatio);
+        renderer.setPixelRatio(cappedPixelRatio());
         renderer.shadowMap.enabled = true;
         renderer.shadowMap.type = THREE.PCFSoftShadowMap;
-        renderer.toneMapping = THREE.ReinhardToneMapping; // Cinematic Tone Mapping
+        // Shadows are re-baked on demand: every frame while flying (the drone
+        // casts one) and once when a drone is loaded, but not while the scene
+        // sits idle on the start screen.
+        renderer.shadowMap.autoUpdate = false;
+        renderer.shadowMap.needsUpdate = true;
+        // Cinematic Tone Mapping. Render targets are never tone-mapped, so this
+        // is applied exactly once, by OutputPass, which reads this setting.
+        renderer.toneMapping = THREE.ReinhardToneMapping;
+        renderer.outputColorSpace = THREE.SRGBColorSpace;
         document.body.appendChild(renderer.domElement);
 
+        TEX_GRASS = bakeNoiseTexture('#1a2615', '#24381e'); // Darker, more contrast
+        // Trunks only cover a few pixels on screen, so bark bakes at 512²
+        TEX_BARK = bakeNoiseTexture('#1b110e', '#0f0907', 2, 512);
+        MAT_TRUNK.map = TEX_BARK;
+
         camera = new THREE.PerspectiveCamera(65, window.innerWidth/window.innerHeight, 0.1, 10000);
+        // Created once and only enabled in orbit mode, so cycling cameras doesn't rebind DOM listeners
+        controls = new OrbitControls(camera, renderer.domElement);
+        controls.enabled = false;
         
         // --- POST PROCESSING PIPELINE ---
         composer = new EffectComposer(renderer);
+        composer.setPixelRatio(renderer.getPixelRatio());
         
         const renderPass = new RenderPass(scene, camera);
         composer.addPass(renderPass);
 
         // BLOOM (Glow effect for Sun/LEDs)
-        const bloomPass = new UnrealBloomPass(new THREE.Vector2(window.innerWidth, window.innerHeight), 1.5, 0.4, 0.85);
+        const bloomPass = new UnrealBloomPass(new THREE.Vector2(window.innerWidth / 2, window.innerHeight / 2), 1.5, 0.4, 0.85);
         bloomPass.threshold = 0.8; // Only very bright things glow
         bloomPass.strength = 0.4; // Glow intensity
         bloomPass.radius = 0.5;
+        // Run the bloom mip chain at half the composer resolution (1/4 the
+        // fragments); its result is upsampled when blended back in.
+        const setBloomSize = bloomPass.setSize.bind(bloomPass);
+        bloomPass.setSize = (width, height) => setBloomSize(Math.ceil(width / 2), Math.ceil(height / 2));
         composer.addPass(bloomPass);
 
         const outputPass = new OutputPass();
@@ -228,15 +325,17 @@ TEMPLATE = """
         sunLight = new THREE.DirectionalLight(0xfff5e0, 4.0); // Brighter sun
         sunLight.position.set(100, 300, 100);
         sunLight.castShadow = true;
-        sunLight.shadow.mapSize.width = 4096;
-        sunLight.shadow.mapSize.height = 4096;
+        sunLight.shadow.mapSize.width = 2048;
+        sunLight.shadow.mapSize.height = 2048;
         sunLight.shadow.camera.near = 0.5;
         sunLight.shadow.camera.far = 1000;
-        const d = 400;
+        const d = SHADOW_HALF_EXTENT;
         sunLight.shadow.camera.left = -d; sunLight.shadow.camera.right = d;
         sunLight.shadow.camera.top = d; sunLight.shadow.camera.bottom = -d;
+        sunLight.shadow.camera.updateProjectionMatrix();
         sunLight.shadow.bias = -0.0001;
         scene.add(sunLight);
+        scene.add(sunLight.target); // keeps the target's world matrix current
 
         // Procedural Sky
         const sky = new Sky();
@@ -246,21 +345,12 @@ TEMPLATE = """
         sky.material.uniforms['rayleigh'].value = 1.5;
         sky.material.uniforms['turbidity'].value = 5;
         sky.material.uniforms['mieCoefficient'].value = 0.005;
+        freezeStatic(sky);
         scene.add(sky);
 
-        // Physics
-        world = new CANNON.World();
-        world.gravity.set(0, -9.81, 0);
-        world.broadphase = new CANNON.SAPBroadphase(world);
-        const defMat = new CANNON.Material();
-        world.addContactMaterial(new CANNON.ContactMaterial(defMat, defMat, {friction:0.8, restitution:0}));
-
-        const groundBody = new CANNON.Body({ mass: 0, material: defMat });
-        groundBody.addShape(new CANNON.Plane());
-        groundBody.quaternion.setFromEuler(-Math.PI/2, 0, 0);
-        world.addBody(groundBody);
-
         buildRanch();
+        // Physics world is built in the worker from the scenery colliders
+        physicsWorker.postMessage({ type: 'init', sab: stateBuffer, trees: treeColliders, cows: cowColliders });
         setupInput();
         if(fleet && fleet.length > 0) loadDrone(fleet[0]);
         clock = new THREE.Clock();
@@ -275,11 +365,102 @@ TEMPLATE = """
         return base + detail;
     }
 
+    // --- SHARED SCENERY ASSETS ---
+    // One geometry/material per scenery part, shared by every instance.
+    // Oak leaves are a unit icosahedron scaled per instance.
+    const OAK_TRUNK_GEO = new THREE.CylinderGeometry(1.2, 1.8, 6, 9);
+    const OAK_LEAF_GEO = new THREE.IcosahedronGeometry(1, 0);
+    const CEDAR_CONE_GEO = new THREE.ConeGeometry(2, 6, 7);
+    const FENCE_POST_GEO = new THREE.CylinderGeometry(0.12, 0.12, 2.5, 5);
+    const FENCE_WIRE_GEO = new THREE.CylinderGeometry(0.015, 0.015, 1);
+    const COW_BODY_GEO = new THREE.BoxGeometry(1.0, 1.2, 2.2);
+    const COW_HEAD_GEO = new THREE.BoxGeometry(0.7, 0.7, 0.9);
+    const COW_FACE_GEO = new THREE.BoxGeometry(0.72, 0.72, 0.1);
+
+    const MAT_TRUNK = new THREE.MeshStandardMaterial({roughness: 1, color: 0x5c4033}); // bark map set in init()
+    const MAT_LEAF = new THREE.MeshStandardMaterial({color: 0x224422, roughness: 0.8});
+    const MAT_CEDAR = new THREE.MeshStandardMaterial({color: 0x334433, roughness: 1});
+    const MAT_POST = new THREE.MeshStandardMaterial({color: 0x6d4c41});
+    const MAT_WIRE = new THREE.MeshStandardMaterial({color: 0xaaaaaa, metalness: 0.5, roughness: 0.2});
+    // Angus/Hereford coat colour comes from per-instance colour, so the shared base is white
+    const MAT_COW = new THREE.MeshStandardMaterial({color: 0xffffff, roughness: 0.6});
+    const MAT_FACE = new THREE.MeshStandardMaterial({color: 0xffffff});
+
+    // --- INSTANCED SCENERY ---
+    // Static scenery is recorded as world matrices into one pool per shared
+    // geometry, then drawn as a single InstancedMesh per pool (one draw call
+    // per geometry instead of one per tree leaf / post / wire / cow part).
+    const scenery = {};
+    const _parent = new THREE.Object3D();
+    const _child = new THREE.Object3D();
+    const _instMatrix = new THREE.Matrix4();
+    const _instColor = new THREE.Color();
+
+    function addSceneryKind(name, geo, mat, castShadow = true) {
+        scenery[name] = { geo, mat, castShadow, matrices: [], colors: [] };
+    }
+
+    // Records _parent * _child as one instance of `name`.
+    function placeInstance(name, color) {
+        const kind = scenery[name];
+        _child.updateMatrix();
+        _instMatrix.multiplyMatrices(_parent.matrix, _child.matrix);
+        for (let e = 0; e < 16; e++) kind.matrices.push(_instMatrix.elements[e]);
+        if (color !== undefined) kind.colors.push(color);
+        _child.position.set(0, 0, 0); _child.rotation.set(0, 0, 0); _child.scale.set(1, 1, 1);
+    }
+
+    // Static objects: compute matrices once and drop them from the per-frame
+    // scene.updateMatrixWorld() traversal.
+    function freezeStatic(obj) {
+        obj.updateMatrix();
+        obj.updateMatrixWorld(true);
+        obj.matrixAutoUpdate = false;
+        obj.matrixWorldAutoUpdate = false;
+    }
+
+    function flushScenery() {
+        for (const name in scenery) {
+            const kind = scenery[name];
+            const count = kind.matrices.length / 16;
+            if (count === 0) continue;
+            const mesh = new THREE.InstancedMesh(kind.geo, kind.mat, count);
+            mesh.instanceMatrix.array.set(kind.matrices);
+            mesh.instanceMatrix.needsUpdate = true;
+            if (kind.colors.length) {
+                for (let i = 0; i < count; i++) mesh.setColorAt(i, _instColor.setHex(kind.colors[i]));
+                mesh.instanceColor.needsUpdate = true;
+            }
+            mesh.castShadow = kind.castShadow;
+            mesh.computeBoundingSphere();
+            freezeStatic(mesh);
+            scene.add(mesh);
+            kind.matrices = kind.colors = null;
+        }
+    }
+
     function buildRanch() {
         // High-Poly Terrain
-        const geo = new THREE.PlaneGeometry(4000, 4000, 256, 256);
-        const pos = geo.attributes.position;
-        for (let i = 0; i < pos.count; i++) pos.setZ(i, getHeightAt(pos.getX(i), pos.getY(i)));
+        const SEGS = 256, N = SEGS + 1;
+        const geo = new THREE.PlaneGeometry(4000, 4000, SEGS, SEGS);
+        // getHeightAt() is separable (sin(x)*cos(z) terms), so precompute the
+        // trig per column and per row and write the raw position buffer:
+        // 4*N trig calls instead of 4*N*N.
+        const arr = geo.attributes.position.array;
+        const sinX200 = new Float32Array(N), sinX30 = new Float32Array(N);
+        const cosZ200 = new Float32Array(N), cosZ50 = new Float32Array(N);
+        for (let i = 0; i < N; i++) {
+            const x = arr[i*3];           // column i, first row
+            const z = arr[i*N*3 + 1];     // row i, first column
+            sinX200[i] = Math.sin(x/200); sinX30[i] = Math.sin(x/30);
+            cosZ200[i] = Math.cos(z/200); cosZ50[i] = Math.cos(z/50);
+        }
+        for (let j = 0; j < N; j++) {
+            const cz200 = cosZ200[j] * 15, cz50 = cosZ50[j] * 2;
+            for (let i = 0; i < N; i++) {
+                arr[(j*N + i)*3 + 2] = sinX200[i]*cz200 + sinX30[i]*cz50;
+            }
+        }
         geo.computeVertexNormals();
         
         const mat = new THREE.MeshStandardMaterial({ 
@@ -291,8 +472,18 @@ TEMPLATE = """
         const terrain = new THREE.Mesh(geo, mat);
         terrain.rotation.x = -Math.PI/2;
         terrain.receiveShadow = true;
+        freezeStatic(terrain);
         scene.add(terrain);
 
+        addSceneryKind('oakTrunk', OAK_TRUNK_GEO, MAT_TRUNK);
+        addSceneryKind('oakLeaf', OAK_LEAF_GEO, MAT_LEAF);
+        addSceneryKind('cedarCone', CEDAR_CONE_GEO, MAT_CEDAR);
+        addSceneryKind('fencePost', FENCE_POST_GEO, MAT_POST);
+        addSceneryKind('fenceWire', FENCE_WIRE_GEO, MAT_WIRE, false);
+        addSceneryKind('cowBody', COW_BODY_GEO, MAT_COW);
+        addSceneryKind('cowHead', COW_HEAD_GEO, MAT_COW);
+        addSceneryKind('cowFace', COW_FACE_GEO, MAT_FACE, false);
+
         // Trees & Brush
         for (let i = 0; i < 50; i++) createOakTree();
         for (let i = 0; i < 150; i++) createCedarBrush();
@@ -305,6 +496,15 @@ TEMPLATE = """
         herds.forEach(herd => {
             for(let i=0; i<20; i++) createCow(herd.x + (Math.random()-0.5)*70, herd.z + (Math.random()-0.5)*70);
         });
+
+        flushScenery();
+    }
+
+    function setParent(x, y, z, rotY = 0, scale = 1) {
+        _parent.position.set(x, y, z);
+        _parent.rotation.set(0, rotY, 0);
+        _parent.scale.setScalar(scale);
+        _parent.updateMatrix();
     }
 
     function createOakTree() {
@@ -313,68 +513,61 @@ TEMPLATE = """
         if (Math.abs(x) < 40 && Math.abs(z) < 40) return; 
         const y = getHeightAt(x, z);
 
-        const group = new THREE.Group();
+        setParent(x, y, z, 0, 1.2 + Math.random()*0.6);
         // Detailed Trunk
-        const trunkGeo = new THREE.CylinderGeometry(1.2, 1.8, 6, 9);
-        const trunkMat = new THREE.MeshStandardMaterial({map: TEX_BARK, roughness: 1, color: 0x5c4033});
-        const trunk = new THREE.Mesh(trunkGeo, trunkMat);
-        trunk.position.y = 3; trunk.castShadow = true; group.add(trunk);
+        _child.position.y = 3;
+        placeInstance('oakTrunk');
 
         // Canopy (Icosahedrons for better low-poly shading)
-        const leafMat = new THREE.MeshStandardMaterial({color: 0x224422, roughness: 0.8});
         for(let j=0; j<10; j++) {
             const size = 3 + Math.random()*3;
-            const leaf = new THREE.Mesh(new THREE.IcosahedronGeometry(size, 0), leafMat);
-            leaf.position.set((Math.random()-0.5)*9, 6 + Math.random()*5, (Math.random()-0.5)*9);
-            leaf.castShadow = true; group.add(leaf);
+            _child.scale.setScalar(size);
+            _child.position.set((Math.random()-0.5)*9, 6 + Math.random()*5, (Math.random()-0.5)*9);
+            placeInstance('oakLeaf');
         }
-        group.position.set(x, y, z);
-        group.scale.setScalar(1.2 + Math.random()*0.6);
-        scene.add(group);
         
-        const body = new CANNON.Body({ mass: 0 });
-        body.addShape(new CANNON.Cylinder(2, 2, 10, 8));
-        body.position.set(x, y, z);
-        world.addBody(body);
+        treeColliders.push([x, y, z]);
     }
 
     function createCedarBrush() {
         const x = (Math.random()-0.5) * 1800;
         const z = (Math.random()-0.5) * 1800;
         const y = getHeightAt(x, z);
-        const group = new THREE.Group();
-        const mat = new THREE.MeshStandardMaterial({color: 0x334433, roughness: 1});
+        setParent(x, y, z);
         for(let k=0; k<4; k++) {
-            const mesh = new THREE.Mesh(new THREE.ConeGeometry(2, 6, 7), mat);
-            mesh.position.set((Math.random()-0.5)*3, 3, (Math.random()-0.5)*3);
-            mesh.rotation.set((Math.random()-0.5)*0.4, 0, (Math.random()-0.5)*0.4);
-            mesh.castShadow = true; group.add(mesh);
+            _child.position.set((Math.random()-0.5)*3, 3, (Math.random()-0.5)*3);
+            _child.rotation.set((Math.random()-0.5)*0.4, 0, (Math.random()-0.5)*0.4);
+            placeInstance('cedarCone');
         }
-        group.position.set(x,y,z);
-        scene.add(group);
     }
 
+    // Fence lines meet at shared corners; each corner gets one post
+    const fencePostKeys = new Set();
+
     function createFenceLine(startX, startZ, length, axis) {
-        const postMat = new THREE.MeshStandardMaterial({color: 0x6d4c41});
-        const wireMat = new THREE.MeshStandardMaterial({color: 0xaaaaaa, metalness: 0.5, roughness: 0.2});
+        setParent(0, 0, 0);
+        let y = getHeightAt(startX, startZ);
         for(let i=0; i<=length; i+=8) { 
             const x = axis === 'x' ? startX + i : startX;
             const z = axis === 'z' ? startZ + i : startZ;
-            const y = getHeightAt(x, z);
-            const post = new THREE.Mesh(new THREE.CylinderGeometry(0.12, 0.12, 2.5, 5), postMat);
-            post.position.set(x, y+1.25, z); post.castShadow = true; scene.add(post);
+            const key = x + ',' + z;
+            if (!fencePostKeys.has(key)) {
+                fencePostKeys.add(key);
+                _child.position.set(x, y+1.25, z);
+                placeInstance('fencePost');
+            }
             if(i < length) {
                 const nX = axis === 'x' ? startX + i + 8 : startX;
                 const nZ = axis === 'z' ? startZ + i + 8 : startZ;
                 const nY = getHeightAt(nX, nZ);
                 for(let h=0; h<3; h++) { // 3 wires
-                    const wire = new THREE.Mesh(new THREE.CylinderGeometry(0.015, 0.015, 1), wireMat);
-                    wire.scale.y = 8;
-                    wire.position.set((x+nX)/2, ((y+0.8+h*0.5)+(nY+0.8+h*0.5))/2, (z+nZ)/2);
-                    wire.rotation.z = axis === 'x' ? Math.PI/2 + Math.atan2(nY-y, 8) : 0;
-                    wire.rotation.x = axis === 'z' ? Math.PI/2 + Math.atan2(nY-y, 8) : 0;
-                    scene.add(wire);
+                    _child.scale.y = 8;
+                    _child.position.set((x+nX)/2, ((y+0.8+h*0.5)+(nY+0.8+h*0.5))/2, (z+nZ)/2);
+                    _child.rotation.z = axis === 'x' ? Math.PI/2 + Math.atan2(nY-y, 8) : 0;
+                    _child.rotation.x = axis === 'z' ? Math.PI/2 + Math.atan2(nY-y, 8) : 0;
+                    placeInstance('fenceWire');
                 }
+                y = nY; // next post sits where this segment ends
             }
         }
     }
@@ -383,50 +576,50 @@ TEMPLATE = """
         const y = getHeightAt(x, z) + 1.2;
         const isAngus = Math.random() > 0.3;
         const color = isAngus ? 0x1a1a1a : 0x8B4513; // Darker Angus
-        const mat = new THREE.MeshStandardMaterial({color: color, roughness: 0.6});
-        const group = new THREE.Group();
+        setParent(x, y, z, Math.random() * Math.PI * 2);
         
-        const body = new THREE.Mesh(new THREE.BoxGeometry(1.0, 1.2, 2.2), mat);
-        body.castShadow = true; group.add(body);
+        placeInstance('cowBody', color);
         
-        const head = new THREE.Mesh(new THREE.BoxGeometry(0.7, 0.7, 0.9), mat);
-        if(Math.random() > 0.6) head.position.set(0, 0.5, 1.4); 
-        else { head.position.set(0, -0.4, 1.4); head.rotation.x = 0.5; }
-        head.castShadow = true; group.add(head);
+        const headUp = Math.random() > 0.6;
+        const setHead = () => {
+            if(headUp) _child.position.set(0, 0.5, 1.4); 
+            else { _child.position.set(0, -0.4, 1.4); _child.rotation.x = 0.5; }
+        };
+        setHead();
+        placeInstance('cowHead', color);
 
         if(!isAngus) {
-            const face = new THREE.Mesh(new THREE.BoxGeometry(0.72, 0.72, 0.1), new THREE.MeshStandardMaterial({color:0xffffff}));
-            face.position.copy(head.position); face.position.z += 0.41; face.rotation.copy(head.rotation);
-            group.add(face);
+            setHead(); _child.position.z += 0.41;
+            placeInstance('cowFace');
         }
-        group.position.set(x, y, z);
-        group.rotation.y = Math.random() * Math.PI * 2;
-        scene.add(group);
 
-        const pBody = new CANNON.Body({mass: 300});
-        pBody.addShape(new CANNON.Box(new CANNON.Vec3(0.5, 0.6, 1.1)));
-        pBody.position.set(x, y, z);
-        world.addBody(pBody);
+        cowColliders.push([x, y, z]);
     }
 
     // --- DRONE LOGIC ---
-    function loadDrone(data) {
-        currentDrone = data;
-        const phys = data.technical_data.physics_config;
-        document.getElementById('drone-specs').innerHTML = `<div class="stat-row"><span>MASS</span><span class="stat-val">${phys.meta.total_weight_g}g</span></div>`;
-
-        if(droneMesh) scene.remove(droneMesh);
-        if(droneBody) world.removeBody(droneBody);
-        droneProps = [];
-
-        droneMesh = new THREE.Group();
-        const sg = data.technical_data.scene_graph;
-        sg.components.forEach(c => {
-            const hex = c.visuals?.primary_color_hex || '#888';
-            let mat;
+    const droneCache = new Map();
+    // Component materials are shared across components and drones by kind + colour
+    const droneMaterials = new Map();
+
+    function droneMaterial(isProp, hex) {
+        const key = (isProp ? 'prop:' : 'body:') + hex;
+        let mat = droneMaterials.get(key);
+        if (!mat) {
             // PBR Materials
-            if(c.type === 'PROPELLER') mat = new THREE.MeshPhysicalMaterial({color:hex, transmission:0.95, opacity:1, roughness:0.2});
+            if(isProp) mat = new THREE.MeshPhysicalMaterial({color:hex, transmission:0.95, opacity:1, roughness:0.2});
             else mat = new THREE.MeshStandardMaterial({color:hex, roughness:0.3, metalness:0.4});
+            droneMaterials.set(key, mat);
+        }
+        return mat;
+    }
+
+    function buildDroneMesh(sg) {
+        const mesh = new THREE.Group();
+        const props = [];
+        sg.components.forEach(c => {
+            const visuals = c.visuals ?? sg.visuals_table?.[c.visuals_id];
+            const hex = visuals?.primary_color_hex || '#888';
+            const mat = droneMaterial(c.type === 'PROPELLER', hex);
 
             let geo;
             if(c.type === 'PROPELLER') geo = new THREE.BoxGeometry(c.dims.radius*2/1000, 0.005, 0.02);
@@ -437,32 +630,49 @@ TEMPLATE = """
             const m = new THREE.Mesh(geo, mat);
             m.position.set(c.pos[0]/1000, c.pos[1]/1000, c.pos[2]/1000);
             if(c.rot) m.rotation.set(c.rot[0], c.rot[1], c.rot[2]);
-            m.castShadow = true; droneMesh.add(m);
-            if(c.type === 'PROPELLER') droneProps.push(m);
+            m.castShadow = true; mesh.add(m);
+            if(c.type === 'PROPELLER') props.push(m);
         });
         
         // Add Emissive "Status Light" to Drone
         const led = new THREE.PointLight(0x00ff88, 2, 5);
         led.position.set(0, 0.05, -0.05);
-        droneMesh.add(led);
+        mesh.add(led);
+        return { mesh, props };
+    }
+
+    function loadDrone(data) {
+        currentDrone = data;
+        const phys = data.technical_data.physics_config;
+        document.getElementById('drone-specs').innerHTML = `<div class="stat-row"><span>MASS</span><span class="stat-val">${phys.meta.total_weight_g}g</span></div>`;
+
+        if(droneMesh) scene.remove(droneMesh);
+
+        // Built drones are kept per SKU, so switching back is just a re-add
+        let built = droneCache.get(data.sku_id);
+        if (!built) {
+            built = buildDroneMesh(data.technical_data.scene_graph);
+            if (data.sku_id !== undefined) droneCache.set(data.sku_id, built);
+        }
+        droneMesh = built.mesh;
+        droneProps = built.props;
         
         scene.add(droneMesh);
-
-        droneBody = new CANNON.Body({
-            mass: phys.mass_kg,
-            position: new CANNON.Vec3(0, 1.0, 0),
-            linearDamping: 0.95, 
-            angularDamping: 0.99
+        renderer.shadowMap.needsUpdate = true;
+
+        physicsWorker.postMessage({
+            type: 'drone',
+            id: data.sku_id,
+            mass_kg: phys.mass_kg,
+            collider_size_m: phys.collider_size_m,
+            pendulum_offset: PENDULUM_OFFSET
         });
-        droneBody.angularFactor = new CANNON.Vec3(0, 1, 0);
-        const shape = new CANNON.Box(new CANNON.Vec3(phys.collider_size_m[0]/2, 0.05, phys.collider_size_m[2]/2));
-        droneBody.addShape(shape, new CANNON.Vec3(0, PENDULUM_OFFSET, 0));
-        world.addBody(droneBody);
     }
 
     function setupInput() {
         window.addEventListener('keydown', (e) => {
             if(!isGameActive) return;
+            const prev = { ...input };
             if(e.code === 'ShiftLeft') input.thrust = 1;
             if(e.code === 'KeyW') input.pitch = 1;
             if(e.code === 'KeyS') input.pitch = -1;
@@ -471,82 +681,79 @@ TEMPLATE = """
             if(e.code === 'KeyQ') input.yaw = 1;
             if(e.code === 'KeyE') input.yaw = -1;
             if(e.code === 'KeyV') {
-                if(camMode === 'chase') { camMode = 'fpv'; document.getElementById('fpv-overlay').style.display = 'block'; }
-                else if(camMode === 'fpv') { camMode = 'orbit'; document.getElementById('fpv-overlay').style.display = 'none'; controls = new OrbitControls(camera, renderer.domElement); }
-                else { camMode = 'chase'; if(controls) { controls.dispose(); controls = null; } }
-                document.getElementById('cam-mode-disp').innerText = camMode.toUpperCase();
-            }
-            if(e.code === 'KeyR') {
-                droneBody.position.set(0, 1, 0); droneBody.velocity.set(0,0,0); currentThrottle = 0;
+                if(camMode === 'chase') { camMode = 'fpv'; fpvOverlay.style.visibility = 'visible'; }
+                else if(camMode === 'fpv') { camMode = 'orbit'; fpvOverlay.style.visibility = 'hidden'; }
+                else camMode = 'chase';
+                controls.enabled = (camMode === 'orbit');
+                camDisp.textContent = camMode.toUpperCase();
             }
+            if(e.code === 'KeyR') physicsWorker.postMessage({ type: 'reset' });
+            sendInputIfChanged(prev);
         });
         window.addEventListener('keyup', (e) => {
+            const prev = { ...input };
             if(e.code === 'ShiftLeft') input.thrust = 0;
             if(['KeyW','KeyS'].includes(e.code)) input.pitch = 0;
             if(['KeyA','KeyD'].includes(e.code)) input.roll = 0;
             if(['KeyQ','KeyE'].includes(e.code)) input.yaw = 0;
+            sendInputIfChanged(prev);
         });
     }
 
+    // Key repeat fires keydown continuously; only forward real changes
+    function sendInputIfChanged(prev) {
+        if(prev.thrust !== input.thrust || prev.pitch !== input.pitch || prev.roll !== input.roll || prev.yaw !== input.yaw) {
+            physicsWorker.postMessage({ type: 'input', input });
+        }
+    }
+
     function animate() {
         requestAnimationFrame(animate);
         const dt = Math.min(clock.getDelta(), 0.1);
         
-        if (isGameActive && droneBody) {
-            world.step(1/60, dt, 3);
-            const phys = currentDrone.technical_data.physics_config;
-            
-            const targetThrust = input.thrust ? 1.0 : 0.0;
-            currentThrottle += (targetThrust - currentThrottle) * 0.05;
-            const thrustForce = 9.81 * phys.mass_kg * 1.8 * currentThrottle;
-
-            const moveSpeed = 15.0 * phys.mass_kg; 
-            const forward = new CANNON.Vec3(0,0,-1);
-            droneBody.quaternion.vmult(forward, forward); forward.y = 0; forward.normalize();
-            const right = new CANNON.Vec3(1,0,0);
-            droneBody.quaternion.vmult(right, right); right.y = 0; right.normalize();
-
-            const moveForce = new CANNON.Vec3();
-            moveForce.x += forward.x * input.pitch * moveSpeed;
-            moveForce.z += forward.z * input.pitch * moveSpeed;
-            moveForce.x -= right.x * input.roll * moveSpeed;
-            moveForce.z -= right.z * input.roll * moveSpeed;
-
-            droneBody.applyForce(droneBody.quaternion.vmult(new CANNON.Vec3(0, thrustForce, 0)), droneBody.position);
-            droneBody.applyForce(moveForce, droneBody.position);
-            droneBody.torque.y = input.yaw * 3.0;
-
-            if(droneBody.position.y > CEILING_HEIGHT) {
-                droneBody.position.y = CEILING_HEIGHT; droneBody.velocity.y = Math.min(0, droneBody.velocity.y);
-            }
+        if (isGameActive && droneMesh) {
+            const currentThrottle = droneState[8];
 
-            droneMesh.position.copy(droneBody.position);
-            droneMesh.quaternion.copy(droneBody.quaternion);
+            _bodyQuat.set(droneState[3], droneState[4], droneState[5], droneState[6]);
+            droneMesh.position.set(droneState[0], droneState[1], droneState[2]);
+            droneMesh.quaternion.copy(_bodyQuat);
             droneMesh.rotateX(input.pitch * -0.2);
             droneMesh.rotateZ(input.roll * 0.2);
-            const offset = new THREE.Vector3(0, PENDULUM_OFFSET, 0);
-            offset.applyQuaternion(droneBody.quaternion);
+            const offset = _offset.set(0, PENDULUM_OFFSET, 0);
+            offset.applyQuaternion(_bodyQuat);
             droneMesh.position.add(offset);
 
-            sunLight.position.set(droneMesh.position.x+50, droneMesh.position.y+100, droneMesh.position.z+50);
-            sunLight.target.position.copy(droneMesh.position);
+            if (droneMesh.position.distanceToSquared(shadowCentre) > SHADOW_RECENTRE_SQ) {
+                shadowCentre.copy(droneMesh.position);
+                sunLight.position.set(shadowCentre.x+50, shadowCentre.y+100, shadowCentre.z+50);
+                sunLight.target.position.copy(shadowCentre);
+            }
+            // The drone's own shadow moves every frame in flight
+            renderer.shadowMap.needsUpdate = true;
             
             droneProps.forEach(p => p.rotation.y += (5 + currentThrottle*50)*dt);
 
             // CAMERA
             if(camMode === 'chase') {
-                const camOff = new THREE.Vector3(0, 2, -6).applyMatrix4(droneMesh.matrixWorld);
+                const camOff = _camOff.set(0, 2, -6).applyMatrix4(droneMesh.matrixWorld);
                 camera.position.lerp(camOff, 0.1);
                 camera.lookAt(droneMesh.position);
             } else if (camMode === 'fpv') {
-                const fpvPos = new THREE.Vector3(0, 0.2, 0.3).applyMatrix4(droneMesh.matrixWorld);
+                const fpvPos = _fpvPos.set(0, 0.2, 0.3).applyMatrix4(droneMesh.matrixWorld);
                 camera.position.copy(fpvPos);
                 camera.quaternion.copy(droneMesh.quaternion);
-            } else if(controls) controls.update();
-
-            document.getElementById('hud-alt').innerText = Math.round(droneBody.position.y);
-            document.getElementById('hud-spd').innerText = Math.round(droneBody.velocity.length()*3.6);
-            document.getElementById('hud-thr').innerText = Math.round(currentThrottle*100) + "%";
+            } else controls.update();
+
+            hudTimer += dt;
+            if (hudTimer >= HUD_INTERVAL) {
+                hudTimer = 0;
+                const alt = Math.round(droneState[1]);
+                const spd = Math.round(droneState[7]*3.6);
+                const thr = Math.round(currentThrottle*100);
+                if (alt !== lastAlt) { hudAlt.textContent = alt; lastAlt = alt; }
+                if (spd !== lastSpd) { hudSpd.textContent = spd; lastSpd = spd; }
+                if (thr !== lastThr) { hudThr.textContent = thr + "%"; lastThr = thr; }
+            }
         }
         
         // RENDER VIA COMPOSER
@@ -557,6 +764,12 @@ TEMPLATE = """
     window.addEventListener('resize', () => {
         camera.aspect = window.innerWidth/window.innerHeight;
         camera.updateProjectionMatrix();
+        // devicePixelRatio changes when the window moves between monitors
+        const pr = cappedPixelRatio();
+        if (pr !== renderer.getPixelRatio()) {
+            renderer.setPixelRatio(pr);
+            composer.setPixelRatio(pr);
+        }
         renderer.setSize(window.innerWidth, window.innerHeight);
         composer.setSize(window.innerWidth, window.innerHeight);
     });
@@ -565,15 +778,186 @@ TEMPLATE = """
 </html>
 """
 
-def replace_nan(obj):
-    if isinstance(obj, float):
-        if math.isnan(obj) or math.isinf(obj): return 0.0
-        return obj
-    elif isinstance(obj, dict):
-        return {k: replace_nan(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [replace_nan(i) for i in obj]
-    return obj
+PHYSICS_WORKER = """
+// Cannon-ES simulation for dashboard.html, run off the render thread.
+import * as CANNON from 'https://unpkg.com/cannon-es@0.20.0/dist/cannon-es.js';
+
+const CEILING_HEIGHT = 200.0;
+// Shared state layout (Float32): pos xyz, quat xyzw, speed m/s, throttle 0..1
+const STATE_LEN = 9;
+// Collision groups: ground and drone stay in the default group
+const GROUP_DEFAULT = 1, GROUP_SCENERY = 2, GROUP_COWS = 4;
+
+let world = null, droneBody = null, droneMass = 0;
+let state = new Float32Array(STATE_LEN), shared = false;
+let active = false;
+let input = { thrust: 0, pitch: 0, roll: 0, yaw: 0 };
+let currentThrottle = 0.0;
+let lastTime = 0;
+const FIXED_STEP = 1/60;
+let accumulator = 0;
+// Scratch vectors reused every step instead of allocating per tick
+const _forward = new CANNON.Vec3(), _right = new CANNON.Vec3();
+const _moveForce = new CANNON.Vec3(), _thrustVec = new CANNON.Vec3();
+const _prevPos = new CANNON.Vec3(), _lerpPos = new CANNON.Vec3();
+const _prevQuat = new CANNON.Quaternion(), _lerpQuat = new CANNON.Quaternion();
+
+function init(msg) {
+    if (msg.sab) { state = new Float32Array(msg.sab); shared = true; }
+
+    world = new CANNON.World();
+    world.gravity.set(0, -9.81, 0);
+    world.broadphase = new CANNON.SAPBroadphase(world);
+    // Sleeping bodies skip integration and are ignored by the broadphase
+    // until something awake touches them
+    world.allowSleep = true;
+    const defMat = new CANNON.Material();
+    world.addContactMaterial(new CANNON.ContactMaterial(defMat, defMat, {friction:0.8, restitution:0}));
+
+    const groundBody = new CANNON.Body({ mass: 0, material: defMat });
+    groundBody.addShape(new CANNON.Plane());
+    groundBody.quaternion.setFromEuler(-Math.PI/2, 0, 0);
+    world.addBody(groundBody);
+
+    // All tree trunks share one static body (one broadphase entry) and one
+    // cylinder shape. Cows are filtered out of tree collisions entirely.
+    const staticScenery = new CANNON.Body({ mass: 0, type: CANNON.Body.STATIC });
+    staticScenery.collisionFilterGroup = GROUP_SCENERY;
+    staticScenery.collisionFilterMask = GROUP_DEFAULT;
+    const trunkShape = new CANNON.Cylinder(2, 2, 10, 8);
+    msg.trees.forEach(([x, y, z]) => staticScenery.addShape(trunkShape, new CANNON.Vec3(x, y, z)));
+    if (msg.trees.length) world.addBody(staticScenery);
+
+    msg.cows.forEach(([x, y, z]) => {
+        const pBody = new CANNON.Body({mass: 300});
+        pBody.collisionFilterGroup = GROUP_COWS;
+        pBody.addShape(new CANNON.Box(new CANNON.Vec3(0.5, 0.6, 1.1)));
+        pBody.position.set(x, y, z);
+        // Cows start asleep where their meshes stand, and only wake when hit
+        pBody.allowSleep = true;
+        pBody.sleepSpeedLimit = 0.1;
+        pBody.sleepTimeLimit = 1;
+        pBody.sleep();
+        world.addBody(pBody);
+    });
+
+    lastTime = performance.now();
+    setInterval(tick, 1000/120);
+}
+
+// Collider shape per drone SKU, reused when the same drone is reloaded
+const droneShapes = new Map();
+
+function loadDrone(msg) {
+    if (droneBody) world.removeBody(droneBody);
+    droneMass = msg.mass_kg;
+    droneBody = new CANNON.Body({
+        mass: msg.mass_kg,
+        position: new CANNON.Vec3(0, 1.0, 0),
+        linearDamping: 0.95, 
+        angularDamping: 0.99
+    });
+    droneBody.angularFactor = new CANNON.Vec3(0, 1, 0);
+    droneBody.allowSleep = false; // applied forces do not wake a sleeping body
+    let shape = droneShapes.get(msg.id);
+    if (!shape) {
+        shape = new CANNON.Box(new CANNON.Vec3(msg.collider_size_m[0]/2, 0.05, msg.collider_size_m[2]/2));
+        if (msg.id !== undefined) droneShapes.set(msg.id, shape);
+    }
+    droneBody.addShape(shape, new CANNON.Vec3(0, msg.pendulum_offset, 0));
+    world.addBody(droneBody);
+    publish();
+}
+
+function resetDrone() {
+    if (!droneBody) return;
+    droneBody.wakeUp();
+    droneBody.position.set(0, 1.0, 0);
+    droneBody.velocity.set(0,0,0);
+    droneBody.quaternion.set(0,0,0,1);
+    currentThrottle = 0;
+    accumulator = 0;
+    publish();
+}
+
+function applyForces() {
+    // Throttle easing is tuned per 60 Hz step
+    const targetThrust = input.thrust ? 1.0 : 0.0;
+    currentThrottle += (targetThrust - currentThrottle) * 0.05;
+    const thrustForce = 9.81 * droneMass * 1.8 * currentThrottle;
+
+    const moveSpeed = 15.0 * droneMass; 
+    const forward = _forward.set(0,0,-1);
+    droneBody.quaternion.vmult(forward, forward); forward.y = 0; forward.normalize();
+    const right = _right.set(1,0,0);
+    droneBody.quaternion.vmult(right, right); right.y = 0; right.normalize();
+
+    const moveForce = _moveForce.set(0,0,0);
+    moveForce.x += forward.x * input.pitch * moveSpeed;
+    moveForce.z += forward.z * input.pitch * moveSpeed;
+    moveForce.x -= right.x * input.roll * moveSpeed;
+    moveForce.z -= right.z * input.roll * moveSpeed;
+
+    _thrustVec.set(0, thrustForce, 0);
+    droneBody.applyForce(droneBody.quaternion.vmult(_thrustVec, _thrustVec), droneBody.position);
+    droneBody.applyForce(moveForce, droneBody.position);
+    droneBody.torque.y = input.yaw * 3.0;
+}
+
+function tick() {
+    const now = performance.now();
+    const dt = Math.min((now - lastTime) / 1000, 0.1);
+    lastTime = now;
+    if (!active || !droneBody) return;
+
+    // Fixed 60 Hz steps regardless of tick jitter; forces are re-applied
+    // before every step because world.step clears them
+    accumulator += dt;
+    while (accumulator >= FIXED_STEP) {
+        _prevPos.copy(droneBody.position);
+        _prevQuat.copy(droneBody.quaternion);
+        applyForces();
+        world.step(FIXED_STEP);
+        if(droneBody.position.y > CEILING_HEIGHT) {
+            droneBody.position.y = CEILING_HEIGHT; droneBody.velocity.y = Math.min(0, droneBody.velocity.y);
+        }
+        accumulator -= FIXED_STEP;
+    }
+    publish(accumulator / FIXED_STEP);
+}
+
+// Plain Float32 stores: a torn read costs one frame of jitter at worst.
+// alpha blends the previous and current step so the pose moves smoothly
+// between 60 Hz steps; without it the current step is published as-is.
+function publish(alpha) {
+    let p = droneBody.position, q = droneBody.quaternion;
+    if (alpha !== undefined) {
+        p = _prevPos.lerp(p, alpha, _lerpPos);
+        q = _prevQuat.slerp(q, alpha, _lerpQuat);
+    }
+    state[0] = p.x; state[1] = p.y; state[2] = p.z;
+    state[3] = q.x; state[4] = q.y; state[5] = q.z; state[6] = q.w;
+    state[7] = droneBody.velocity.length();
+    state[8] = currentThrottle;
+    if (!shared) postMessage(state);
+}
+
+onmessage = (e) => {
+    const msg = e.data;
+    if (msg.type === 'init') init(msg);
+    else if (msg.type === 'drone') loadDrone(msg);
+    else if (msg.type === 'input') input = msg.input;
+    else if (msg.type === 'start') { active = true; resetDrone(); }
+    else if (msg.type === 'reset') resetDrone();
+};
+"""
+
+class IsolatedHandler(GzipHandler):
+    """Serves with COOP/COEP so the page may share a SharedArrayBuffer with the physics worker."""
+    def end_headers(self):
+        self.send_header("Cross-Origin-Opener-Policy", "same-origin")
+        self.send_header("Cross-Origin-Embedder-Policy", "require-corp")
+        super().end_headers()
 
 def generate_flight_sim():
     if not os.path.exists(CATALOG_FILE):
@@ -582,26 +966,27 @@ def generate_flight_sim():
 
     with open(CATALOG_FILE, "r") as f:
         try: 
-            raw_data = json.load(f)
-            data = replace_nan(raw_data)
+            # Non-finite values are replaced while the C scanner parses,
+            # instead of rebuilding the whole tree afterwards
+            data = json.load(f, parse_constant=zero_constant)
         except Exception as e:
             print(f"❌ JSON Load Error: {e}")
             return
 
-    json_str = json.dumps(data)
-    html_content = TEMPLATE.replace("__FLEET_DATA__", json_str)
+    html_content = TEMPLATE.replace("__FLEET_URL__", OUTPUT_FLEET)
 
-    with open(OUTPUT_HTML, "w") as f:
-        f.write(html_content)
+    write_with_gzip(OUTPUT_FLEET, dumps_json(data).encode())
+    write_with_gzip(OUTPUT_HTML, html_content.encode())
+    write_with_gzip(OUTPUT_WORKER, PHYSICS_WORKER.encode())
 
     print(f"✅ Ranch Sim v4.0 (Cinematic) generated: {OUTPUT_HTML}")
     
-    socketserver.TCPServer.allow_reuse_address = True
     PORT = 8000
-    Handler = http.server.SimpleHTTPRequestHandler
+    Handler = IsolatedHandler
     
     try:
-        with socketserver.TCPServer(("", PORT), Handler) as httpd:
+        # One thread per connection, so parallel asset requests don't queue
+        with http.server.ThreadingHTTPServer(("", PORT), Handler) as httpd:
             print(f"🎮 Simulator Active: http://localhost:{PORT}/{OUTPUT_HTML}")
             webbrowser.open(f"http://localhost:{PORT}/{OUTPUT_HTML}")
             httpd.serve_forever()
@@ -1,14 +1,25 @@
 # FILE: tools/refine_arsenal.py
 import asyncio
+import hashlib
 import json
 import os
 import re
+import tempfile
 from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import google.generativeai as genai
 from app.config import settings
+from app.json_cache import read_json, write_json
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
 
 # --- CONFIG ---
 ARSENAL_FILE = "drone_arsenal.json"
+MAX_CONCURRENCY = 5  # components audited/investigated at once
+TEXT_ONLY_MIN_CHARS = 2000  # page text needed before trying a text-only extraction
+AUDIT_CACHE_FILE = "audit_cache.json"
 
 if settings.GOOGLE_API_KEY:
     genai.configure(api_key=settings.GOOGLE_API_KEY)
@@ -36,19 +47,6 @@ Return JSON:
 }}
 """
 
-UI_NAVIGATOR_PROMPT = """
-You are a QA Automation Agent. 
-I need to find the **Specification Table**, **Wiring Diagram**, or **Thrust Data**.
-Analyze the screenshot.
-
-Return JSON:
-{{
-  "action": "CLICK" or "SCROLL" or "DONE",
-  "target_text": "string (Exact text to click, e.g. 'Specifications', 'Manual', 'Read More')",
-  "confidence": float
-}}
-"""
-
 EXTRACTOR_PROMPT = """
 You are a Forensic Engineer. 
 Extract technical data from the provided **PAGE TEXT** and **SCREENSHOT**.
@@ -73,139 +71,307 @@ Return JSON:
 }}
 """
 
+# First look at a page: extract what is visible AND pick what to click, in one call
+COMBINED_PROMPT = """
+You are a Forensic Engineer with a QA Automation Agent's eye for page layout.
+Using the provided **PAGE TEXT** and **SCREENSHOT**:
+
+1.  **Extract:** Find mounting patterns, voltages, protocols, and any **Thrust Tables**,
+    **Pinout Diagrams**, or **Dimension Drawings** visible in the image.
+2.  **Navigate:** If data is still missing, name the tab or link that most likely leads to
+    the **Specification Table**, **Wiring Diagram**, or **Thrust Data**.
+
+**MISSING KEYS TO FIND:** {missing_keys}
+
+**SPECIAL INSTRUCTION FOR MOTORS:**
+If you see a Thrust Table in the image, extract the data for 50% and 100% throttle.
+Format: "thrust_data": {{"50_pct_g": 1200, "100_pct_g": 3400, "prop": "15x5"}}
+
+**PAGE TEXT:**
+{page_text}
+
+Return JSON:
+{{
+  "nav": {{
+    "action": "CLICK" or "SCROLL" or "DONE",
+    "target_text": "string (Exact text to click, e.g. 'Specifications', 'Manual', 'Read More')",
+    "confidence": float
+  }},
+  "found_data": {{ "key": "value" }},
+  "still_missing": ["key"]
+}}
+"""
+
+_CODEFENCE_RE = re.compile(r"```(json)?\s*({.*})\s*```", re.DOTALL)
+
+_JSON_DECODER = json.JSONDecoder()
+
 def clean_json(text):
     if not text: return {}
+    match = _CODEFENCE_RE.search(text)
+    if match: text = match.group(2)
+    # Decode exactly one object from the first "{"; trailing prose (and any
+    # stray braces in it) is never looked at
+    s = text.find("{")
+    if s == -1: return {}
+    try:
+        obj, _end = _JSON_DECODER.raw_decode(text, s)
+        return obj
+    except ValueError:
+        return {}
+
+def _load_audit_cache():
+    try:
+        return read_json(AUDIT_CACHE_FILE)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+# Audit verdicts keyed by a hash of the audited inputs, persisted across runs
+_audit_cache = _load_audit_cache()
+
+def save_audit_cache():
     try:
-        match = re.search(r"```(json)?\s*({.*})\s*```", text, re.DOTALL)
-        json_str = match.group(2) if match else text
-        if not match:
-            s, e = text.find("{"), text.rfind("}") + 1
-            if s != -1 and e != -1: json_str = text[s:e]
-        return json.loads(json_str)
-    except: return {}
+        write_json(AUDIT_CACHE_FILE, _audit_cache)
+    except Exception as e:
+        print(f"      ❌ Audit cache save error: {e}")
 
 def save_arsenal(data):
     """Helper to write to disk immediately."""
     try:
-        with open(ARSENAL_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+        write_json(ARSENAL_FILE, data)
     except Exception as e:
         print(f"      ❌ Save Error: {e}")
 
 async def audit_component(model, comp):
+    specs = comp.get('specs', {}) or comp.get('engineering_specs', {})
+    key = hashlib.sha1(
+        json.dumps([comp.get('model_name'), comp.get('category'), specs], sort_keys=True).encode()
+    ).hexdigest()
+    if key in _audit_cache:
+        return _audit_cache[key]
+
     prompt = AUDITOR_PROMPT.format(
         name=comp.get('model_name'),
         category=comp.get('category'),
-        specs=json.dumps(comp.get('specs', {}) or comp.get('engineering_specs', {}))
+        specs=json.dumps(specs)
     )
     res = await model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"})
-    return clean_json(res.text)
+    audit = clean_json(res.text)
+    # Unparseable responses aren't cached so the next run asks again
+    if audit: _audit_cache[key] = audit
+    return audit
 
-async def investigate_url(comp, missing_keys):
+async def grab_screenshot(page):
+    """Screenshot as a PIL image, capped to what Gemini's vision tiles actually use."""
+    # Helper to create Image object for Gemini
+    import PIL.Image
+    # Playwright writes straight to disk and PIL decodes from the file (at a
+    # reduced JPEG draft scale), so the encoded bytes never sit in Python
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    os.close(fd)
+    try:
+        await page.screenshot(path=path, type="jpeg", quality=60)
+        screenshot_img = PIL.Image.open(path)
+        screenshot_img.thumbnail((1024, 1024), PIL.Image.Resampling.LANCZOS)
+        # open() is lazy and thumbnail() skips decoding small images: decode
+        # now so Pillow releases the file before it is removed below
+        screenshot_img.load()
+        return screenshot_img
+    finally:
+        os.remove(path)
+
+SPEC_SELECTORS = ['.product-description', '#description', '.tabs', '.woocommerce-Tabs-panel', 'table']
+
+async def scrape_page_text(page):
+    if HTMLParser is not None:
+        # Parse the serialized DOM in C instead of forcing a layout for innerText
+        tree = HTMLParser(await page.content())
+        tree.strip_tags(['script', 'style', 'noscript'])
+        node = next((n for n in map(tree.css_first, SPEC_SELECTORS) if n is not None), tree.body)
+        content = node.text(separator=' ') if node is not None else ""
+    else:
+        content = await page.evaluate("""(selectors) => {
+            for (let s of selectors) {
+                const el = document.querySelector(s);
+                if (el) return el.innerText;
+            }
+            return document.body.innerText;
+        }""", SPEC_SELECTORS)
+    return content.replace("\n", " ")[:15000]
+
+async def extract_specs(vision_model, clean_text, screenshot_img, missing_keys):
+    # Born-digital pages usually carry the specs as text, so try text-only
+    # first and only pay for vision when the text can't answer
+    prompt = EXTRACTOR_PROMPT.format(missing_keys=missing_keys, page_text=clean_text)
+    lower_text = clean_text.lower()
+    if len(clean_text) > TEXT_ONLY_MIN_CHARS and any(str(k).lower() in lower_text for k in missing_keys):
+        text_resp = await vision_model.generate_content_async(
+            prompt, generation_config={"response_mime_type": "application/json"}
+        )
+        result = clean_json(text_resp.text)
+        if result.get('found_data') and not result.get('still_missing'):
+            return result
+
+    # MULTIMODAL EXTRACTION (Text + Image)
+    extract_resp = await vision_model.generate_content_async(
+        [
+            prompt,
+            screenshot_img # Pass the image for chart reading
+        ],
+        generation_config={"response_mime_type": "application/json"}
+    )
+    return clean_json(extract_resp.text)
+
+async def investigate_url(browser, comp, missing_keys):
     url = comp.get('source_url')
     if not url: return None
 
     print(f"      🕵️  Refining: {comp['model_name'][:30]}...")
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page(viewport={"width": 1920, "height": 1080})
+    ctx = None
+    try:
+        # Each investigation gets its own context (tab + cookies) on the shared browser
+        ctx = await browser.new_context(viewport={"width": 1280, "height": 720})
+        page = await ctx.new_page()
+        # Don't block on DOMContentLoaded (many shops never fire it cleanly);
+        # the navigation keeps going after the timeout and the fixed render
+        # wait below covers it.
+        try:
+            await page.goto(url, timeout=500, wait_until="commit")
+        except PlaywrightTimeoutError:
+            pass
+        await asyncio.sleep(2)
+
+        # 1. FIRST LOOK: extract what's already visible and pick a tab to click
+        screenshot_img = await grab_screenshot(page)
+        clean_text = await scrape_page_text(page)
+
+        vision_model = genai.GenerativeModel('gemini-2.5-pro')
+        first_resp = await vision_model.generate_content_async([
+            COMBINED_PROMPT.format(missing_keys=missing_keys, page_text=clean_text),
+            screenshot_img
+        ], generation_config={"response_mime_type": "application/json"})
         
+        first = clean_json(first_resp.text)
+        nav = first.get('nav') or {}
+        found_data = first.get('found_data')
+        if not isinstance(found_data, dict): found_data = {}
+        still_missing = first.get('still_missing', missing_keys)
+
+        if not (still_missing and nav.get('action') == 'CLICK' and nav.get('confidence', 0) > 0.8):
+            return {"found_data": found_data, "still_missing": still_missing}
+
+        # 2. VISUAL NAVIGATION (Click "Specs" tabs), then extract again
         try:
-            await page.goto(url, timeout=30000, wait_until="domcontentloaded")
-            await asyncio.sleep(2)
-
-            # 1. VISUAL NAVIGATION (Click "Specs" tabs)
-            screenshot_bytes = await page.screenshot(type="jpeg", quality=60)
-            
-            # Helper to create Image object for Gemini
-            import PIL.Image
-            from io import BytesIO
-            screenshot_img = PIL.Image.open(BytesIO(screenshot_bytes))
-
-            vision_model = genai.GenerativeModel('gemini-2.5-pro')
-            nav_resp = await vision_model.generate_content_async([
-                UI_NAVIGATOR_PROMPT,
-                screenshot_img
-            ], generation_config={"response_mime_type": "application/json"})
-            
-            nav = clean_json(nav_resp.text)
-            
-            if nav.get('action') == 'CLICK' and nav.get('confidence', 0) > 0.8:
+            await page.get_by_text(nav['target_text'], exact=False).first.click(timeout=3000)
+            await asyncio.sleep(1)
+            # Take new screenshot after click
+            screenshot_img = await grab_screenshot(page)
+        except:
+            return {"found_data": found_data, "still_missing": still_missing}
+
+        clean_text = await scrape_page_text(page)
+        result = await extract_specs(vision_model, clean_text, screenshot_img, still_missing)
+        more = result.get('found_data')
+        if isinstance(more, dict): found_data.update(more)
+        return {"found_data": found_data, "still_missing": result.get('still_missing', [])}
+
+    except Exception as e:
+        print(f"      ❌ Scrape Error: {e}")
+        return None
+    finally:
+        if ctx is not None: await ctx.close()
+
+class SharedBrowser:
+    """One headless Chromium for the whole run, launched on first use."""
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        async with self._lock:
+            if self._browser is None:
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+        return self._browser
+
+    async def close(self):
+        if self._browser is not None: await self._browser.close()
+        if self._playwright is not None: await self._playwright.stop()
+
+async def process_component(model, shared_browser, comp, sem, fixed):
+    """
+    Audits one component and, if it fails, investigates its source page and
+    patches in what was found. Returns "PASS", "FIXED" or "CULL", or None when
+    the component errored (it is then left as is).
+    """
+    async with sem:
+        try:
+            audit = await audit_component(model, comp)
+            if audit.get('status') != 'FAIL':
+                return "PASS"
+
+            investigation = None
+            # Failures without a source URL are culled without ever touching Playwright
+            if comp.get('source_url'):
+                browser = await shared_browser.get()
+                investigation = await investigate_url(browser, comp, audit.get('missing_keys', []))
+            found_data = investigation.get('found_data') if investigation else None
+
+            if isinstance(found_data, dict) and found_data:
+                if 'specs' not in comp: comp['specs'] = {}
                 try:
-                    await page.get_by_text(nav['target_text'], exact=False).first.click(timeout=3000)
-                    await asyncio.sleep(1)
-                    # Take new screenshot after click
-                    screenshot_bytes = await page.screenshot(type="jpeg", quality=60)
-                    screenshot_img = PIL.Image.open(BytesIO(screenshot_bytes))
-                except: pass
-
-            # 2. TEXT EXTRACTION
-            content = await page.evaluate("""() => {
-                const selectors = ['.product-description', '#description', '.tabs', '.woocommerce-Tabs-panel', 'table'];
-                for (let s of selectors) {
-                    const el = document.querySelector(s);
-                    if (el) return el.innerText;
-                }
-                return document.body.innerText;
-            }""")
-            
-            clean_text = content.replace("\n", " ")[:15000]
-
-            # 3. MULTIMODAL EXTRACTION (Text + Image)
-            extract_resp = await vision_model.generate_content_async(
-                [
-                    EXTRACTOR_PROMPT.format(missing_keys=missing_keys, page_text=clean_text),
-                    screenshot_img # Pass the image for chart reading
-                ],
-                generation_config={"response_mime_type": "application/json"}
-            )
-            
-            return clean_json(extract_resp.text)
+                    comp['specs'].update(found_data)
+                except Exception:
+                    return "CULL"
+                comp['verified'] = True
+                fixed.append(comp)
+                print(f"      ✅ Fixed {comp['model_name']}: Found {list(found_data.keys())}")
+                return "FIXED"
 
+            print(f"      🗑️  CULLING {comp['model_name']}: Still missing {audit.get('missing_keys', [])}")
+            return "CULL"
         except Exception as e:
-            print(f"      ❌ Scrape Error: {e}")
+            # One rate-limited or blocked response must not sink the whole run
+            print(f"      ❌ Refinery Error ({comp.get('model_name', '?')}): {e}")
             return None
-        finally:
-            await browser.close()
 
 async def run_refinery():
     print("🔬 OPENFORGE REFINERY: Improving Data Integrity...")
     
     if not os.path.exists(ARSENAL_FILE): return
 
-    with open(ARSENAL_FILE, "r") as f:
-        data = json.load(f)
+    data = read_json(ARSENAL_FILE)
     
     model = genai.GenerativeModel('gemini-2.5-pro')
     components_list = data.get("components", [])[:] 
-    components_to_remove = []
 
-    for i, comp in enumerate(components_list):
-        audit = await audit_component(model, comp)
-        
-        if audit.get('status') == 'FAIL':
-            missing = audit.get('missing_keys', [])
-            investigation = await investigate_url(comp, missing)
-            found_data = investigation.get('found_data') if investigation else None
-            
-            if investigation and isinstance(found_data, dict) and found_data:
-                if 'specs' not in comp: comp['specs'] = {}
-                try:
-                    comp['specs'].update(found_data)
-                    comp['verified'] = True
-                    print(f"      ✅ Fixed {comp['model_name']}: Found {list(found_data.keys())}")
-                    data["components"][i] = comp
-                    save_arsenal(data)
-                except Exception as e:
-                    components_to_remove.append(i)
-            else:
-                print(f"      🗑️  CULLING {comp['model_name']}: Still missing {missing}")
-                components_to_remove.append(i)
+    # Audits and investigations are network-bound, so run them concurrently.
+    # Fixes are applied in place as they land; culls are folded in afterwards.
+    # At most one Chromium is launched, and only once some component
+    # actually needs scraping.
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    shared_browser = SharedBrowser()
+    fixed = []
+    verdicts = None
+    try:
+        verdicts = await asyncio.gather(*[
+            process_component(model, shared_browser, c, sem, fixed) for c in components_list
+        ])
+    finally:
+        await shared_browser.close()
+        # Keep the audits and fixes already made even if the run is interrupted
+        save_audit_cache()
+        if fixed and verdicts is None:
+            save_arsenal(data)
 
+    components_to_remove = {i for i, v in enumerate(verdicts) if v == "CULL"}
     if components_to_remove:
-        cleaned_list = [c for idx, c in enumerate(data["components"]) if idx not in components_to_remove]
-        data["components"] = cleaned_list
+        data["components"] = [c for idx, c in enumerate(data["components"]) if idx not in components_to_remove]
+
+    # One write for the whole run instead of one per fixed component
+    if fixed or components_to_remove:
         save_arsenal(data)
 
     print(f"\n✅ Refinery Complete. Arsenal size: {len(data['components'])}")
@@ -2,11 +2,13 @@
 import json
 import os
 import http.server
-import socketserver
 import webbrowser
+from app.json_cache import dumps_json
+from app.preview_server import GzipHandler, write_with_gzip, zero_constant
 
 CATALOG_FILE = "drone_catalog.json"
 OUTPUT_HTML = "dashboard.html"
+OUTPUT_FLEET = "fleet.json"
 
 TEMPLATE = """
 <!DOCTYPE html>
@@ -105,8 +107,8 @@ TEMPLATE = """
     import * as THREE from 'three';
     import { OrbitControls } from 'three/addons/controls/OrbitControls.js';
 
-    // Inject Data safely
-    const fleet = __FLEET_DATA__; 
+    // Fleet data is a separate file so the page itself stays small
+    const fleet = await (await fetch('__FLEET_URL__')).json();
 
     // --- THREE.JS SETUP ---
     const container = document.getElementById('canvas-container');
@@ -144,20 +146,75 @@ TEMPLATE = """
     controls.autoRotateSpeed = 0.5;
 
     // Animation Loop
+    // Spinning parts are instances: {mesh, index, position, quaternion, scale}
     const spinners = [];
+    const _spinQuat = new THREE.Quaternion().setFromAxisAngle(new THREE.Vector3(0, 1, 0), 0.2);
+    const _spinMatrix = new THREE.Matrix4();
     function animate() {
         requestAnimationFrame(animate);
         controls.update();
-        spinners.forEach(mesh => mesh.rotateY(0.2));
+        spinners.forEach(s => {
+            s.quaternion.multiply(_spinQuat); // same as Object3D.rotateY(0.2)
+            s.mesh.setMatrixAt(s.index, _spinMatrix.compose(s.position, s.quaternion, s.scale));
+            s.mesh.instanceMatrix.needsUpdate = true;
+        });
         renderer.render(scene, camera);
     }
     animate();
 
     // --- DRONE BUILDER ---
+    // One InstancedMesh per component type. Geometries are unit-sized and the
+    // component dims go into each instance's scale; colours are per instance.
+    const PART_TYPES = {
+        FRAME_CORE: {
+            geometry: new THREE.BoxGeometry(1, 1, 1),
+            scale: d => [d.length, d.thickness || 4, d.width]
+        },
+        FRAME_ARM: {
+            geometry: new THREE.BoxGeometry(1, 1, 1).translate(0.5, 0, 0), // Pivot from end
+            scale: d => [d.length, d.thickness || 5, d.width]
+        },
+        MOTOR: {
+            geometry: new THREE.CylinderGeometry(1, 1, 1, 32),
+            scale: d => [d.radius, d.height || 15, d.radius],
+            color: 0x333333 // Dark motors usually
+        },
+        PROPELLER: {
+            geometry: new THREE.BoxGeometry(1, 1, 1),
+            scale: d => [d.radius * 2, 1, 8],
+            material: { transparent: true, opacity: 0.9 }
+        },
+        BATTERY: {
+            geometry: new THREE.BoxGeometry(1, 1, 1),
+            scale: d => [d.length, d.height, d.width],
+            color: 0x111111,
+            material: { roughness: 0.8 }
+        },
+        PCB_STACK: {
+            geometry: new THREE.BoxGeometry(1, 1, 1),
+            scale: d => [d.width, d.height, d.width], // Square stack
+            color: 0x2244aa
+        },
+        OTHER: {
+            geometry: new THREE.BoxGeometry(1, 1, 1),
+            scale: d => [10, 10, 10]
+        }
+    };
+    for (const kind of Object.values(PART_TYPES)) {
+        // White base so the instance colour comes through unchanged
+        kind.mat = new THREE.MeshStandardMaterial({ color: 0xffffff, roughness: 0.3, metalness: 0.7, ...kind.material });
+    }
+    const _dummy = new THREE.Object3D();
+    const _color = new THREE.Color();
+
     function buildDrone(sceneGraph) {
         // Clear previous
         for (let i = scene.children.length - 1; i >= 0; i--) {
-            if (scene.children[i].type === "Group") scene.remove(scene.children[i]);
+            const child = scene.children[i];
+            if (child.type === "Group") {
+                child.children.forEach(m => m.dispose());
+                scene.remove(child);
+            }
         }
         spinners.length = 0;
 
@@ -165,56 +222,43 @@ TEMPLATE = """
 
         if (!sceneGraph || !sceneGraph.components) return;
 
+        const byType = new Map();
         sceneGraph.components.forEach(comp => {
-            let geometry;
-            const dims = comp.dims || { length: 10, width: 10, height: 10, radius: 5 };
-            const color = parseInt((comp.visuals?.primary_color_hex || '#888888').replace('#', '0x'));
-            
-            const material = new THREE.MeshStandardMaterial({ 
-                color: color,
-                roughness: 0.3,
-                metalness: 0.7
-            });
-
-            // Geometry Logic matching Python logic
-            if (comp.type === "FRAME_CORE") {
-                geometry = new THREE.BoxGeometry(dims.length, dims.thickness || 4, dims.width);
-            } 
-            else if (comp.type === "FRAME_ARM") {
-                geometry = new THREE.BoxGeometry(dims.length, dims.thickness || 5, dims.width);
-                geometry.translate(dims.length / 2, 0, 0); // Pivot from end
-            } 
-            else if (comp.type === "MOTOR") {
-                geometry = new THREE.CylinderGeometry(dims.radius, dims.radius, dims.height || 15, 32);
-                material.color.setHex(0x333333); // Dark motors usually
-            } 
-            else if (comp.type === "PROPELLER") {
-                geometry = new THREE.BoxGeometry(dims.radius * 2, 1, 8);
-                material.color.setHex(color);
-                material.transparent = true;
-                material.opacity = 0.9;
-            } 
-            else if (comp.type === "BATTERY") {
-                geometry = new THREE.BoxGeometry(dims.length, dims.height, dims.width);
-                material.color.setHex(0x111111);
-                material.roughness = 0.8;
-            } 
-            else if (comp.type === "PCB_STACK") {
-                geometry = new THREE.BoxGeometry(dims.width, dims.height, dims.width); // Square stack
-                material.color.setHex(0x2244aa);
-            }
-            else {
-                geometry = new THREE.BoxGeometry(10, 10, 10);
-            }
+            const type = comp.type in PART_TYPES ? comp.type : 'OTHER';
+            if (!byType.has(type)) byType.set(type, []);
+            byType.get(type).push(comp);
+        });
 
-            const mesh = new THREE.Mesh(geometry, material);
-            
-            // Apply Transforms
-            if (comp.pos) mesh.position.set(comp.pos[0], comp.pos[1], comp.pos[2]);
-            if (comp.rot) mesh.rotation.set(comp.rot[0], comp.rot[1], comp.rot[2]);
+        byType.forEach((comps, type) => {
+            const kind = PART_TYPES[type];
+            const mesh = new THREE.InstancedMesh(kind.geometry, kind.mat, comps.length);
+
+            comps.forEach((comp, index) => {
+                const dims = comp.dims || { length: 10, width: 10, height: 10, radius: 5 };
+                const visuals = comp.visuals ?? sceneGraph.visuals_table?.[comp.visuals_id];
+                const color = parseInt((visuals?.primary_color_hex || '#888888').replace('#', '0x'));
+
+                // Apply Transforms
+                _dummy.position.set(0, 0, 0);
+                _dummy.rotation.set(0, 0, 0);
+                if (comp.pos) _dummy.position.set(comp.pos[0], comp.pos[1], comp.pos[2]);
+                if (comp.rot) _dummy.rotation.set(comp.rot[0], comp.rot[1], comp.rot[2]);
+                _dummy.scale.fromArray(kind.scale(dims));
+                _dummy.updateMatrix();
+                mesh.setMatrixAt(index, _dummy.matrix);
+                mesh.setColorAt(index, _color.setHex(kind.color ?? color));
+
+                if (comp.is_dynamic) spinners.push({
+                    mesh, index,
+                    position: _dummy.position.clone(),
+                    quaternion: _dummy.quaternion.clone(),
+                    scale: _dummy.scale.clone()
+                });
+            });
 
-            if (comp.is_dynamic) spinners.push(mesh);
-            
+            // Spinners rewrite their matrices every frame
+            if (spinners.some(s => s.mesh === mesh)) mesh.instanceMatrix.setUsage(THREE.DynamicDrawUsage);
+            mesh.computeBoundingSphere();
             group.add(mesh);
         });
 
@@ -295,26 +339,28 @@ def generate_dashboard():
         print("❌ No catalog found. Run design_fleet.py first.")
         return
 
-    with open(CATALOG_FILE, "r") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            print("❌ Catalog JSON is corrupt.")
-            return
+    try:
+        with open(CATALOG_FILE, "r") as f:
+            # The catalog holds NaN values; the page's fetch().json() rejects
+            # them, so replace non-finite constants while parsing
+            data = json.load(f, parse_constant=zero_constant)
+    except json.JSONDecodeError:
+        print("❌ Catalog JSON is corrupt.")
+        return
 
-    # Inject JSON data
-    json_str = json.dumps(data)
-    html_content = TEMPLATE.replace("__FLEET_DATA__", json_str)
+    # Fleet data goes to its own file, fetched by the page
+    html_content = TEMPLATE.replace("__FLEET_URL__", OUTPUT_FLEET)
 
-    with open(OUTPUT_HTML, "w") as f:
-        f.write(html_content)
+    write_with_gzip(OUTPUT_FLEET, dumps_json(data).encode())
+    write_with_gzip(OUTPUT_HTML, html_content.encode())
 
     print(f"✅ Dashboard generated: {OUTPUT_HTML}")
     
     # Serve
     PORT = 8000
-    Handler = http.server.SimpleHTTPRequestHandler
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    Handler = GzipHandler
+    # One thread per connection, so parallel asset requests don't queue
+    with http.server.ThreadingHTTPServer(("", PORT), Handler) as httpd:
         print(f"🌍 Serving at http://localhost:{PORT}")
         webbrowser.open(f"http://localhost:{PORT}/{OUTPUT_HTML}")
         try:
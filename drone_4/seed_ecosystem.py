@@ -1,13 +1,15 @@
 # FILE: tools/seed_ecosystem.py
 import asyncio
-import json
 import os
-import random
 from app.services.ai_service import call_llm_for_json
 from app.services.fusion_service import fuse_component_data
 from app.services.texture_service import extract_visual_dna
+from app.json_cache import read_json, write_json
 
 ARSENAL_FILE = "drone_arsenal.json"
+MAX_CONCURRENCY = 4  # parts asked about at once
+HUNT_CONCURRENCY = 3  # fusion hunts in flight at once
+NEEDS_CACHE_FILE = "needs_cache.json"
 
 # --- PROMPT 1: THE LOGISTICS EXPERT (Cables & Connectors) ---
 ECOSYSTEM_PROMPT = """
@@ -45,6 +47,21 @@ Identify the SINGLE BEST complementary component required to make this part fly
 ["Specific Complementary Component Name"]
 """
 
+def _load_needs_cache():
+    try:
+        return read_json(NEEDS_CACHE_FILE)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+# Raw LLM answers keyed by "category|model name", persisted across runs
+_needs_cache = _load_needs_cache()
+
+def save_needs_cache():
+    try:
+        write_json(NEEDS_CACHE_FILE, _needs_cache)
+    except Exception as e:
+        print(f"      ❌ Needs cache save error: {e}")
+
 async def agent_identify_needs(part):
     """
     Decides which expert to consult based on the part category.
@@ -71,8 +88,14 @@ async def agent_identify_needs(part):
     else:
         return []
 
-    # Call AI
-    needs = await call_llm_for_json(prompt, system_instruction)
+    # Call AI (once per category + model name across runs)
+    cache_key = f"{category}|{part['model_name'].strip().lower()}"
+    if cache_key in _needs_cache:
+        needs = _needs_cache[cache_key]
+    else:
+        needs = await call_llm_for_json(prompt, system_instruction)
+        # None means the call failed; leave it for the next run to retry
+        if needs is not None: _needs_cache[cache_key] = needs
     
     # Handle the raw list return or dict wrapper
     if isinstance(needs, list): return needs
@@ -90,44 +113,65 @@ async def seed_ecosystem():
         print("❌ No arsenal found.")
         return
 
-    with open(ARSENAL_FILE, "r") as f:
-        data = json.load(f)
-        current_inventory = data.get("components", [])
+    data = read_json(ARSENAL_FILE)
+    current_inventory = data.get("components", [])
 
     # Create a quick lookup set of what we already have (case insensitive)
     # We use both exact model name AND generic terms to avoid buying "Propellers" if we have "Gemfan Props"
     existing_names = {c['model_name'].lower() for c in current_inventory}
+    # One NUL-joined haystack, so "is this need a substring of any name we
+    # have" is a single C-level search instead of a Python loop over names
+    existing_blob = "\0".join(existing_names)
     
-    # Iterate through a COPY of the list so we don't loop over items we just added
-    for part in list(current_inventory):
-        
+    # Pass 1: ask about every part at once. Iterate a COPY of the list so we
+    # don't ask about items this run adds.
+    parts = [
+        part for part in current_inventory
         # Skip generic placeholders or unverified items to save API tokens
-        if not part.get('verified', False) and "generic" in part['model_name'].lower():
-            continue
-
-        print(f"\n🧐 Analyzing Dependencies for: {part['model_name']} ({part['category']})...")
-        
-        # 1. Identify what is needed
-        needed_items = await agent_identify_needs(part)
-        
+        if part.get('verified', False) or "generic" not in part['model_name'].lower()
+    ]
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def identify(part):
+        async with sem:
+            print(f"\n🧐 Analyzing Dependencies for: {part['model_name']} ({part['category']})...")
+            return await agent_identify_needs(part)
+
+    needs_per_part = await asyncio.gather(*[identify(part) for part in parts])
+    save_needs_cache()
+
+    # Many parts share needs (every ESC wants an XT60 pigtail): hunt each
+    # distinct need once and remember every part that asked for it
+    unique_needs = {}
+    for part, needed_items in zip(parts, needs_per_part):
         for item_query in needed_items:
-            # 2. Check if we already have it
+            if not isinstance(item_query, str) or not item_query.strip(): continue
+            key = item_query.strip().lower()
+            query, parents = unique_needs.setdefault(key, (item_query.strip(), []))
+            if part['model_name'] not in parents: parents.append(part['model_name'])
+
+    # Pass 2: hunt the missing ones concurrently; the semaphore is the rate limit
+    hunt_sem = asyncio.Semaphore(HUNT_CONCURRENCY)
+
+    async def hunt(key, item_query, parents):
+        nonlocal existing_blob
+        async with hunt_sem:
+            # 2. Check if we already have it (re-checked here, since a hunt that
+            # finished while this one waited may have filled it)
             # Simple fuzzy check: if "XT60" is needed, and we have an "XT60 Pigtail", skip.
-            is_present = any(item_query.lower() in existing for existing in existing_names)
-            
-            if is_present:
-                # print(f"   ✅ Already have: {item_query}")
-                continue
+            if key in existing_blob:
+                return
                 
             print(f"   🔍 Missing Dependency: {item_query}. Hunting...")
             
             # Determine Category for Fusion Service based on query keywords
             target_category = "Interconnect"
-            if "prop" in item_query.lower(): target_category = "Propellers"
-            elif "motor" in item_query.lower(): target_category = "Motors"
-            elif "battery" in item_query.lower() or "lipo" in item_query.lower(): target_category = "Battery"
+            if "prop" in key: target_category = "Propellers"
+            elif "motor" in key: target_category = "Motors"
+            elif "battery" in key or "lipo" in key: target_category = "Battery"
             
-            # 3. Hunt for it using Fusion Service
+            # 3. Hunt for it using Fusion Service (it reports failures,
+            # rate limits included, as None rather than raising)
             result = await fuse_component_data(
                 part_type=target_category, 
                 search_query=f"{item_query} price specs",
@@ -135,31 +179,38 @@ async def seed_ecosystem():
                 min_confidence=0.65 
             )
             
-            if result:
-                print(f"      ✨ FOUND: {result['product_name']}")
-                
-                # Tag it so we know which parent part triggered this find
-                result['tags'] = ["ECOSYSTEM_AUTOFILL", f"REQ_FOR_{part['model_name']}"]
-                
-                # Get visuals
-                result['visuals'] = await extract_visual_dna(result['reference_image'], target_category)
-                
-                # --- INSTANT SAVE BLOCK ---
-                # Update memory
-                current_inventory.append(result)
-                existing_names.add(result['product_name'].lower())
-                
-                # Write to disk immediately
-                data['components'] = current_inventory
-                with open(ARSENAL_FILE, "w") as f:
-                    json.dump(data, f, indent=2)
-                print(f"      💾 Saved to Arsenal immediately.")
-                # --------------------------
-                
-                # Rate limit politeness
-                await asyncio.sleep(random.uniform(2.0, 5.0))
-            else:
+            if not result:
                 print(f"      ❌ Could not source: {item_query}")
+                return
+
+            print(f"      ✨ FOUND: {result['product_name']}")
+            found_name = result['product_name'].lower()
+            if found_name in existing_names:
+                return  # another need already pulled in the same product
+            
+            # Tag it so we know which parent parts triggered this find
+            result['tags'] = ["ECOSYSTEM_AUTOFILL"] + [f"REQ_FOR_{name}" for name in parents]
+            
+            # Get visuals
+            result['visuals'] = await extract_visual_dna(result['reference_image'], target_category)
+            
+            # --- INSTANT SAVE BLOCK ---
+            # Update memory
+            current_inventory.append(result)
+            existing_names.add(found_name)
+            existing_blob += "\0" + found_name
+            
+            # Write to disk immediately
+            data['components'] = current_inventory
+            write_json(ARSENAL_FILE, data)
+            print(f"      💾 Saved to Arsenal immediately.")
+            # --------------------------
+
+    await asyncio.gather(*[
+        hunt(key, item_query, parents)
+        for key, (item_query, parents) in unique_needs.items()
+        if key not in existing_blob
+    ])
 
     print("\n✅ Ecosystem is stable. Dependencies filled.")
 
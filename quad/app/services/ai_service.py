@@ -8,6 +8,8 @@ from app.prompts import *
 if settings.GOOGLE_API_KEY:
     genai.configure(api_key=settings.GOOGLE_API_KEY)
 
+LLM_MODEL = 'gemini-2.5-pro'
+
 def parse_json_garbage(text: str) -> dict | None:
     if not text: return None
     match = re.search(r"```(json)?\s*({.*})\s*```", text, re.DOTALL)
@@ -22,7 +24,7 @@ def parse_json_garbage(text: str) -> dict | None:
 
 async def call_llm_for_json(prompt: str, system_instruction: str) -> dict | None:
     try:
-        model = genai.GenerativeModel('gemini-2.5-pro', system_instruction=system_instruction)
+        model = genai.GenerativeModel(LLM_MODEL, system_instruction=system_instruction)
         response = await model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"})
         return parse_json_garbage(response.text)
     except Exception as e:
@@ -1,14 +1,26 @@
 # FILE: app/services/cad_service.py
+import functools
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import os
 import subprocess
+import threading
 import logging
 import trimesh
 import numpy as np
+try:
+    from numba import njit, types
+    from numba.typed import Dict
+except ImportError:
+    njit = None
 
 # Helper function to find parts in the BOM
 def find_part_in_bom(bom, part_type_query):
+    # Substring match, so "actuator" still finds e.g. "Leg Actuator"
+    query = part_type_query.casefold()
     for item in bom:
-        if part_type_query.lower() in item.get("part_type", "").lower():
+        if query in item.get("part_type", "").casefold():
             return item
     return None
 
@@ -19,6 +31,138 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(CURRENT_DIR))
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "output")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Rendered meshes keyed by a hash of the SCAD script (identical dims -> identical mesh)
+CACHE_DIR = os.path.join(OUTPUT_DIR, "_cache")
+CACHE_MAX_ENTRIES = 256
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+def _sweep_cache():
+    """Drops the least recently used entries beyond CACHE_MAX_ENTRIES."""
+    entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".obj")]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[CACHE_MAX_ENTRIES:]:
+        for ext in (".obj", ".npz"):
+            try:
+                os.remove(os.path.splitext(entry.path)[0] + ext)
+            except FileNotFoundError:
+                pass
+
+_sweep_cache()
+
+def _copy_into(src: str, dst: str):
+    # Copy to a temp name first so readers never see a half-written file
+    # (per thread: parts and missions render concurrently in worker threads)
+    tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if not _copy_file_range(src, tmp):
+        shutil.copyfile(src, tmp)  # sendfile() on Linux
+    os.replace(tmp, dst)
+
+def _copy_file_range(src: str, dst: str) -> bool:
+    """
+    In-kernel copy via copy_file_range(2), which btrfs/xfs turn into a
+    reflink (Linux >= 5.3). Returns False when unsupported so the caller
+    can fall back to a regular copy.
+    """
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        return remaining == 0
+    except OSError:
+        return False
+
+@functools.lru_cache(maxsize=1)
+def _openscad_backend_args() -> tuple:
+    """
+    Picks the Manifold CSG backend when this OpenSCAD build has one.
+    Newer builds take --backend=Manifold, 2023-2024 snapshots --enable=manifold,
+    older snapshots get CGAL's fast-csg path, and stable releases keep the
+    default CGAL backend.
+    (lazy-union is left off: it would export the chassis body and its servo
+    mounts as separate overlapping shells.)
+    """
+    try:
+        probe = subprocess.run(["openscad", "--help"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=10, text=True)
+    except (OSError, subprocess.TimeoutExpired):
+        return ()
+    if "--backend" in probe.stdout:
+        return ("--backend=Manifold",)
+    if "manifold" in probe.stdout:
+        return ("--enable=manifold",)
+    if "fast-csg" in probe.stdout:
+        return ("--enable=fast-csg",)
+    return ()
+
+def warmup():
+    """Runs the one-off OpenSCAD capability probe ahead of the first render."""
+    _openscad_backend_args()
+
+# Binary STL record: normal, three corners, attribute byte count (50 bytes)
+_STL_DTYPE = np.dtype([("normal", "<f4", (3,)), ("v", "<f4", (3, 3)), ("attr", "<u2")])
+
+if njit is not None:
+    _VERT_KEY = types.UniTuple(types.float32, 3)
+
+    @njit(cache=True)
+    def dedup_verts(corners):
+        """
+        Merges identical rows of corners float32[N,3] in a single hash-map pass.
+        Returns (unique vertices float32[K,3], corner -> vertex index int32[N]).
+        """
+        seen = Dict.empty(key_type=_VERT_KEY, value_type=types.int32)
+        vertices = np.empty_like(corners)
+        remap = np.empty(corners.shape[0], dtype=np.int32)
+        count = 0
+        for i in range(corners.shape[0]):
+            key = (corners[i, 0], corners[i, 1], corners[i, 2])
+            if key in seen:
+                remap[i] = seen[key]
+            else:
+                seen[key] = count
+                vertices[count] = corners[i]
+                remap[i] = count
+                count += 1
+        return vertices[:count], remap
+else:
+    def dedup_verts(corners):
+        """np.unique fallback for when numba isn't installed."""
+        vertices, inverse = np.unique(corners, axis=0, return_inverse=True)
+        return vertices, inverse.reshape(-1).astype(np.int32)
+
+def read_binary_stl(path: str):
+    """
+    Parses a binary STL straight into (vertices float32[N,3], faces int32[M,3]),
+    merging the shared triangle corners. Returns None if the file isn't binary STL.
+    """
+    with open(path, "rb") as f:
+        buf = f.read()
+    if len(buf) < 84:
+        return None
+    count = int(np.frombuffer(buf, "<u4", 1, 80)[0])
+    if len(buf) != 84 + 50 * count:
+        return None
+    corners = np.frombuffer(buf, _STL_DTYPE, count, 84)["v"].reshape(-1, 3)
+    vertices, remap = dedup_verts(np.ascontiguousarray(corners))
+    return vertices, remap.reshape(-1, 3)
+
+def write_obj(path: str, vertices, faces):
+    """
+    Writes a bare v/f OBJ. All rows go through one bulk %-format, which is
+    several times quicker than np.savetxt's per-row formatting.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64)
+    faces = np.asarray(faces, dtype=np.int64) + 1  # OBJ indices are 1-based
+    text = ("v %.6f %.6f %.6f\n" * len(vertices)) % tuple(vertices.ravel().tolist())
+    text += ("f %d %d %d\n" * len(faces)) % tuple(faces.ravel().tolist())
+    with open(path, "w") as f:
+        f.write(text)
+
 def render_scad(script: str, output_filename: str) -> str | None:
     # Ensure filename is clean
     clean_name = output_filename.lower().replace(" ", "_")
@@ -28,13 +172,25 @@ def render_scad(script: str, output_filename: str) -> str | None:
     stl_path = os.path.join(OUTPUT_DIR, f"{clean_name}.stl")
     # FINAL: Convert to OBJ (USD likes this)
     obj_path = os.path.join(OUTPUT_DIR, f"{clean_name}.obj")
+    # Raw vertices/faces next to the OBJ, read back by IsaacService without re-parsing
+    npz_path = os.path.join(OUTPUT_DIR, f"{clean_name}.npz")
     
     with open(scad_path, "w") as f:
         f.write(script)
+
+    key = hashlib.blake2b(script.encode(), digest_size=16).hexdigest()
+    cached_obj = os.path.join(CACHE_DIR, f"{key}.obj")
+    cached_npz = os.path.join(CACHE_DIR, f"{key}.npz")
+    if os.path.exists(cached_obj) and os.path.exists(cached_npz):
+        _copy_into(cached_obj, obj_path)
+        _copy_into(cached_npz, npz_path)
+        os.utime(cached_obj)  # mark as recently used for the sweep
+        print(f"      ✅ Asset Ready (cached): {clean_name}.obj")
+        return obj_path
     
     try:
         # 1. Run OpenSCAD -> STL
-        cmd = ["openscad", "-o", stl_path, scad_path]
+        cmd = ["openscad", *_openscad_backend_args(), "--export-format", "binstl", "-o", stl_path, scad_path]
         
         result = subprocess.run(
             cmd, 
@@ -48,20 +204,29 @@ def render_scad(script: str, output_filename: str) -> str | None:
         # 2. Python Convert STL -> OBJ
         if os.path.exists(stl_path):
             print(f"      🔄 Converting to OBJ: {clean_name}...")
-            mesh = trimesh.load(stl_path)
-            # trimesh.load can return a Scene or a Trimesh. Handle both.
-            if isinstance(mesh, trimesh.Scene):
-                # If it's a scene, export the whole thing
-                # We merge to ensure a single mesh for Isaac Physics
-                mesh = trimesh.util.concatenate(mesh.dump())
+            parsed = read_binary_stl(stl_path)
+            if parsed is not None:
+                vertices, faces = parsed
+            else:
+                mesh = trimesh.load(stl_path)
+                # trimesh.load can return a Scene or a Trimesh. Handle both.
+                if isinstance(mesh, trimesh.Scene):
+                    # If it's a scene, export the whole thing
+                    # We merge to ensure a single mesh for Isaac Physics
+                    mesh = trimesh.util.concatenate(mesh.dump())
+                vertices, faces = mesh.vertices, mesh.faces
             
-            mesh.export(obj_path)
+            np.savez(npz_path, v=np.asarray(vertices, dtype=np.float32), f=np.asarray(faces, dtype=np.int32))
+            # The OBJ stays the asset for external viewers and downloads
+            write_obj(obj_path, vertices, faces)
             
             if os.path.exists(obj_path):
+                _copy_into(npz_path, cached_npz)
+                _copy_into(obj_path, cached_obj)  # the .obj marks the entry complete
                 print(f"      ✅ Asset Ready: {clean_name}.obj")
                 return obj_path
             else:
-                print(f"      ❌ Trimesh conversion failed.")
+                print(f"      ❌ OBJ conversion failed.")
                 return None
         else:
             print(f"      ❌ OpenSCAD ran but NO STL created.")
@@ -131,8 +296,10 @@ def generate_assets(project_id: str, blueprint: dict, bom: list) -> dict:
     """
 
     # B. FEMUR
+    # 24-sided circles: the sim collides against convex hulls of these, and
+    # 50 sides roughly doubled the vertex count for no visible gain
     femur_script = f"""
-    $fn=50;
+    $fn=24;
     module femur() {{
         difference() {{
             union() {{
@@ -149,7 +316,7 @@ def generate_assets(project_id: str, blueprint: dict, bom: list) -> dict:
 
     # C. TIBIA
     tibia_script = f"""
-    $fn=50;
+    $fn=24;
     module tibia() {{
         union() {{
             difference() {{
@@ -164,9 +331,18 @@ def generate_assets(project_id: str, blueprint: dict, bom: list) -> dict:
     """
 
     # --- 3. RENDER ASSETS ---
-    assets["individual_parts"]["Chassis_Kit"] = render_scad(chassis_script, f"{project_id}_chassis_kit")
-    assets["individual_parts"]["Femur_Leg"] = render_scad(femur_script, f"{project_id}_femur_leg")
-    assets["individual_parts"]["Tibia_Leg"] = render_scad(tibia_script, f"{project_id}_tibia_leg")
+    # The three parts are independent. Threads are enough because the CSG runs
+    # in the OpenSCAD child process, and unlike a process pool they also work
+    # inside daemonic Celery workers.
+    jobs = {
+        "Chassis_Kit": (chassis_script, f"{project_id}_chassis_kit"),
+        "Femur_Leg": (femur_script, f"{project_id}_femur_leg"),
+        "Tibia_Leg": (tibia_script, f"{project_id}_tibia_leg"),
+    }
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {name: pool.submit(render_scad, *args) for name, args in jobs.items()}
+    for name, future in futures.items():
+        assets["individual_parts"][name] = future.result()
 
     # --- 4. COLLISION CHECK (Optional) ---
     try:
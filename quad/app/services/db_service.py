@@ -124,6 +124,7 @@ class ArsenalDB:
         for r in rows:
             d = dict(r)
             d['engineering_specs'] = json.loads(d['specs_json']) if d['specs_json'] else {}
+            d['visuals'] = json.loads(d['visuals_json']) if d['visuals_json'] else {}
             results.append(d)
         return results
 
@@ -52,18 +52,21 @@ def validate_critical_specs(part_type, specs):
 
     return True
 
-async def process_single_candidate(scraper, item, part_type, vision_prompt_object, min_confidence):
+def is_candidate(item):
+    """Search hits worth scraping: has a link and title, not a blocked domain or listing page."""
     link = item.get('link')
     title = item.get('title')
     
-    if not link or not title: return None
-    if any(bad_domain in link for bad_domain in DOMAIN_BLOCKLIST): return None
-    if any(bad_word in title.lower() for bad_word in GENERIC_TITLE_BLOCKLIST): return None
+    if not link or not title: return False
+    if any(bad_domain in link for bad_domain in DOMAIN_BLOCKLIST): return False
+    if any(bad_word in title.lower() for bad_word in GENERIC_TITLE_BLOCKLIST): return False
+    return True
 
-    print(f"   Trying: {title[:50]}...")
-    
-    # 1. Deep Scrape
-    scraped_data = await scraper.scrape_product_page(link)
+async def process_single_candidate(item, scraped_data, part_type, vision_prompt_object, min_confidence):
+    link = item.get('link')
+    title = item.get('title')
+
+    # 1. Deep Scrape (done for all candidates up front by Scraper.scrape_many)
     if not scraped_data: return None
 
     final_price = scraped_data.get('price')
@@ -133,9 +136,19 @@ async def fuse_component_data(part_type: str, search_query: str, search_limit: i
     results = find_components(search_query, limit=search_limit)
     if not results: return None
 
+    results = [res for res in results if is_candidate(res)]
+    if not results: return None
+    for res in results:
+        print(f"   Trying: {res['title'][:50]}...")
+
+    # One batched scrape for every candidate link, then analyze them together
     async with Scraper() as scraper:
-        tasks = [process_single_candidate(scraper, res, part_type, vision_prompt, min_confidence) for res in results]
-        candidates = await asyncio.gather(*tasks)
+        pages = await scraper.scrape_many([res['link'] for res in results])
+    tasks = [
+        process_single_candidate(res, page, part_type, vision_prompt, min_confidence)
+        for res, page in zip(results, pages)
+    ]
+    candidates = await asyncio.gather(*tasks)
         
     valid_candidates = [c for c in candidates if c is not None]
     if not valid_candidates: return None
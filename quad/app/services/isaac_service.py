@@ -17,7 +17,12 @@ os.makedirs(USD_EXPORT_DIR, exist_ok=True)
 
 class IsaacService:
     def __init__(self):
-        pass
+        # (path, mtime) -> (points, face counts, face indices); the femur and
+        # tibia meshes are shared by all four legs
+        self._mesh_cache = {}
+        # (path, mtime) -> Vt arrays of the mesh's convex hull, used as the
+        # link's collision shape
+        self._hull_cache = {}
 
     def generate_robot_usd(self, robot_data):
         if Usd is None: return None
@@ -38,10 +43,15 @@ class IsaacService:
         # Apply Articulation Root API to the top-level Xform
         UsdPhysics.ArticulationRootAPI.Apply(root_prim.GetPrim())
 
+        # Prims and schemas are defined through Usd below (that needs a
+        # composed stage); their attribute values are queued here and
+        # authored together in one Sdf.ChangeBlock at the end
+        pending = []
+
         # 2. Add Chassis (Fixed Base or Floating Base)
         # We start with a flat hierarchy to avoid XformStack errors in PhysX
         chassis_path = f"{root_path}/Chassis"
-        self._add_link(stage, chassis_path, "chassis_kit", mass_kg=2.0, sku=sku, is_root=True)
+        self._add_link(stage, pending, chassis_path, "chassis_kit", mass_kg=2.0, sku=sku, is_root=True)
         
         # Dimensions
         # Ideally passed from robot_data, using hardcoded defaults for now if missing
@@ -69,12 +79,12 @@ class IsaacService:
             femur_path = f"{root_path}/Femur_{prefix}"
             hip_world_pos = Gf.Vec3f(leg['x'] * hip_off_x, leg['y'] * hip_off_y, 0)
             
-            self._add_link(stage, femur_path, "femur_leg", mass_kg=0.2, pos=hip_world_pos, sku=sku)
+            self._add_link(stage, pending, femur_path, "femur_leg", mass_kg=0.2, pos=hip_world_pos, sku=sku)
             
             # Hip Joint (Connects Chassis -> Femur)
             # We define the joint INSIDE the Child (Femur)
             self._add_revolute_joint(
-                stage, 
+                pending,
                 joint_path=f"{femur_path}/Joint_Hip_{prefix}",
                 body0_path=chassis_path, 
                 body1_path=femur_path,
@@ -93,11 +103,11 @@ class IsaacService:
             tibia_path = f"{root_path}/Tibia_{prefix}"
             knee_world_pos = hip_world_pos + Gf.Vec3f(femur_len, 0, 0)
             
-            self._add_link(stage, tibia_path, "tibia_leg", mass_kg=0.15, pos=knee_world_pos, sku=sku)
+            self._add_link(stage, pending, tibia_path, "tibia_leg", mass_kg=0.15, pos=knee_world_pos, sku=sku)
             
             # Knee Joint (Connects Femur -> Tibia)
             self._add_revolute_joint(
-                stage,
+                pending,
                 joint_path=f"{tibia_path}/Joint_Knee_{prefix}",
                 body0_path=femur_path,
                 body1_path=tibia_path,
@@ -110,21 +120,25 @@ class IsaacService:
                 stiffness=10000.0
             )
 
-        stage.GetRootLayer().Save()
+        layer = stage.GetRootLayer()
+        self._author_pending(layer, pending)
+        layer.Save()
         print(f"   ⚡ Generated Articulated USD (Flat Hierarchy): {stage_path}")
         return stage_path
 
-    def _add_link(self, stage, path, stl_key, mass_kg, pos=Gf.Vec3f(0,0,0), sku="robot_dog", is_root=False):
+    def _add_link(self, stage, pending, path, stl_key, mass_kg, pos=Gf.Vec3f(0,0,0), sku="robot_dog", is_root=False):
         """Adds a Rigid Body Mesh (Link)."""
         xform = UsdGeom.Xform.Define(stage, path)
-        xform.AddTranslateOp().Set(pos)
         
         # Physics API
-        rigid_api = UsdPhysics.RigidBodyAPI.Apply(xform.GetPrim())
-        rigid_api.CreateRigidBodyEnabledAttr(True)
-        
-        mass_api = UsdPhysics.MassAPI.Apply(xform.GetPrim())
-        mass_api.CreateMassAttr(mass_kg)
+        UsdPhysics.RigidBodyAPI.Apply(xform.GetPrim())
+        UsdPhysics.MassAPI.Apply(xform.GetPrim())
+        pending.append((path, None, [
+            ("xformOp:translate", Sdf.ValueTypeNames.Double3, Gf.Vec3d(pos), Sdf.VariabilityVarying),
+            ("xformOpOrder", Sdf.ValueTypeNames.TokenArray, Vt.TokenArray(["xformOp:translate"]), Sdf.VariabilityUniform),
+            ("physics:rigidBodyEnabled", Sdf.ValueTypeNames.Bool, True, Sdf.VariabilityVarying),
+            ("physics:mass", Sdf.ValueTypeNames.Float, mass_kg, Sdf.VariabilityVarying),
+        ], []))
         
         # Visual Mesh
         mesh_path = f"{path}/Visual"
@@ -134,58 +148,130 @@ class IsaacService:
         if os.path.exists(mesh_abs_path):
             try:
                 # Embed Geometry
-                tm_mesh = trimesh.load(mesh_abs_path)
-                if isinstance(tm_mesh, trimesh.Scene):
-                    tm_mesh = trimesh.util.concatenate(tm_mesh.dump())
-
-                usd_mesh = UsdGeom.Mesh.Define(stage, mesh_path)
-                usd_mesh.CreatePointsAttr(tm_mesh.vertices)
-                usd_mesh.CreateFaceVertexCountsAttr([3] * len(tm_mesh.faces))
-                usd_mesh.CreateFaceVertexIndicesAttr(tm_mesh.faces.flatten())
-                usd_mesh.CreateDisplayColorAttr([Gf.Vec3f(0.5, 0.5, 0.5)])
-                
-                # COLLISION FIX: Explicitly set approximation to convexHull
-                # This fixes the "triangle mesh collision cannot be dynamic" error
-                coll_api = UsdPhysics.CollisionAPI.Apply(usd_mesh.GetPrim())
-                mesh_coll_api = UsdPhysics.MeshCollisionAPI.Apply(usd_mesh.GetPrim())
-                mesh_coll_api.CreateApproximationAttr("convexHull")
+                points, counts, indices = self._mesh_vt_arrays(mesh_abs_path)
+                hull_points, hull_counts, hull_indices = self._hull_vt_arrays(mesh_abs_path)
+
+                UsdGeom.Mesh.Define(stage, mesh_path)
+                pending.append((mesh_path, None, [
+                    ("points", Sdf.ValueTypeNames.Point3fArray, points, Sdf.VariabilityVarying),
+                    ("faceVertexCounts", Sdf.ValueTypeNames.IntArray, counts, Sdf.VariabilityVarying),
+                    ("faceVertexIndices", Sdf.ValueTypeNames.IntArray, indices, Sdf.VariabilityVarying),
+                    ("primvars:displayColor", Sdf.ValueTypeNames.Color3fArray, Vt.Vec3fArray([Gf.Vec3f(0.5, 0.5, 0.5)]), Sdf.VariabilityVarying),
+                ], []))
+
+                # Collision: a sibling guide mesh holding the precomputed hull.
+                # It is already convex, so PhysX's convexHull pass over it is
+                # trivial instead of re-hulling the full visual mesh per leg.
+                # (Approximation stays convexHull: a plain triangle mesh
+                # collider cannot be dynamic.)
+                coll_mesh = UsdGeom.Mesh.Define(stage, f"{path}/Collision")
+                UsdPhysics.CollisionAPI.Apply(coll_mesh.GetPrim())
+                UsdPhysics.MeshCollisionAPI.Apply(coll_mesh.GetPrim())
+                pending.append((f"{path}/Collision", None, [
+                    ("points", Sdf.ValueTypeNames.Point3fArray, hull_points, Sdf.VariabilityVarying),
+                    ("faceVertexCounts", Sdf.ValueTypeNames.IntArray, hull_counts, Sdf.VariabilityVarying),
+                    ("faceVertexIndices", Sdf.ValueTypeNames.IntArray, hull_indices, Sdf.VariabilityVarying),
+                    ("purpose", Sdf.ValueTypeNames.Token, UsdGeom.Tokens.guide, Sdf.VariabilityUniform),
+                    ("physics:approximation", Sdf.ValueTypeNames.Token, "convexHull", Sdf.VariabilityUniform),
+                ], []))
                 
             except Exception as e:
                 print(f"      ❌ Failed to embed mesh {mesh_filename}: {e}")
-                self._create_fallback_cube(stage, mesh_path)
+                self._create_fallback_cube(stage, pending, mesh_path)
         else:
             print(f"      ⚠️ Missing Mesh File: {mesh_filename}")
-            self._create_fallback_cube(stage, mesh_path)
+            self._create_fallback_cube(stage, pending, mesh_path)
+
+    def _mesh_vt_arrays(self, mesh_abs_path):
+        """Vt arrays for a mesh asset, loaded once per file version."""
+        key = (mesh_abs_path, os.stat(mesh_abs_path).st_mtime_ns)
+        cached = self._mesh_cache.get(key)
+        if cached is None:
+            vertices, faces = self._load_mesh_arrays(mesh_abs_path)
+            cached = self._mesh_cache[key] = self._vt_arrays(vertices, faces)
+        return cached
+
+    def _hull_vt_arrays(self, mesh_abs_path):
+        """Vt arrays for a mesh asset's convex hull, computed once per file version."""
+        key = (mesh_abs_path, os.stat(mesh_abs_path).st_mtime_ns)
+        cached = self._hull_cache.get(key)
+        if cached is None:
+            vertices, faces = self._load_mesh_arrays(mesh_abs_path)
+            hull = trimesh.convex.convex_hull(trimesh.Trimesh(vertices=vertices, faces=faces, process=False))
+            cached = self._hull_cache[key] = self._vt_arrays(hull.vertices, hull.faces)
+        return cached
+
+    @staticmethod
+    def _vt_arrays(vertices, faces):
+        # Vt arrays built straight from contiguous numpy buffers, instead
+        # of converting every vertex/index through Python
+        points = Vt.Vec3fArray.FromNumpy(np.ascontiguousarray(vertices, dtype=np.float32))
+        indices = Vt.IntArray.FromNumpy(np.ascontiguousarray(faces, dtype=np.int32).ravel())
+        counts = Vt.IntArray.FromNumpy(np.full(len(faces), 3, dtype=np.int32))
+        return points, counts, indices
 
-    def _create_fallback_cube(self, stage, path):
+    def _load_mesh_arrays(self, mesh_abs_path):
+        """(vertices, faces) for an OBJ asset, from the CAD service's .npz sidecar when present."""
+        npz_path = os.path.splitext(mesh_abs_path)[0] + ".npz"
+        if os.path.exists(npz_path):
+            with np.load(npz_path) as data:
+                return data["v"], data["f"]
+        tm_mesh = trimesh.load(mesh_abs_path)
+        if isinstance(tm_mesh, trimesh.Scene):
+            tm_mesh = trimesh.util.concatenate(tm_mesh.dump())
+        return tm_mesh.vertices, tm_mesh.faces
+
+    def _create_fallback_cube(self, stage, pending, path):
         cube = UsdGeom.Cube.Define(stage, path)
-        cube.CreateSizeAttr(0.05)
+        pending.append((path, None, [("size", Sdf.ValueTypeNames.Double, 0.05, Sdf.VariabilityVarying)], []))
         # Collision for fallback
-        coll_api = UsdPhysics.CollisionAPI.Apply(cube.GetPrim())
+        UsdPhysics.CollisionAPI.Apply(cube.GetPrim())
         # Cubes don't need MeshCollisionAPI approximation, standard collision works
 
-    def _add_revolute_joint(self, stage, joint_path, body0_path, body1_path, pos0, pos1, axis, limit, stiffness):
-        joint = UsdPhysics.RevoluteJoint.Define(stage, joint_path)
-        
-        # Define Relationship Targets
-        joint.CreateBody0Rel().AddTarget(body0_path)
-        joint.CreateBody1Rel().AddTarget(body1_path)
-        
-        # Define Pivot Frames (Relative to Body0 and Body1)
-        joint.CreateLocalPos0Attr().Set(pos0) 
-        joint.CreateLocalRot0Attr().Set(Gf.Quatf(1,0,0,0))
-        
-        joint.CreateLocalPos1Attr().Set(pos1)
-        joint.CreateLocalRot1Attr().Set(Gf.Quatf(1,0,0,0))
-        
-        # Axis and Limits
-        joint.CreateAxisAttr(axis)
-        joint.CreateLowerLimitAttr(limit[0])
-        joint.CreateUpperLimitAttr(limit[1])
-        
-        # Drive
-        driveAPI = UsdPhysics.DriveAPI.Apply(joint.GetPrim(), "angular")
-        driveAPI.CreateTypeAttr("force") 
-        driveAPI.CreateStiffnessAttr(stiffness) 
-        driveAPI.CreateDampingAttr(stiffness / 10.0) 
-        driveAPI.CreateTargetPositionAttr(0.0)
\ No newline at end of file
+    def _add_revolute_joint(self, pending, joint_path, body0_path, body1_path, pos0, pos1, axis, limit, stiffness):
+        # Joints have no children and nothing reads them back, so the whole
+        # prim (type, drive schema, attributes) is authored as an Sdf spec
+        # inside the change block, skipping the UsdPhysics wrappers
+        pending.append((joint_path, ("PhysicsRevoluteJoint", ["PhysicsDriveAPI:angular"]), [
+            # Pivot Frames (Relative to Body0 and Body1)
+            ("physics:localPos0", Sdf.ValueTypeNames.Point3f, pos0, Sdf.VariabilityVarying),
+            ("physics:localRot0", Sdf.ValueTypeNames.Quatf, Gf.Quatf(1,0,0,0), Sdf.VariabilityVarying),
+            ("physics:localPos1", Sdf.ValueTypeNames.Point3f, pos1, Sdf.VariabilityVarying),
+            ("physics:localRot1", Sdf.ValueTypeNames.Quatf, Gf.Quatf(1,0,0,0), Sdf.VariabilityVarying),
+            # Axis and Limits
+            ("physics:axis", Sdf.ValueTypeNames.Token, axis.upper(), Sdf.VariabilityUniform),
+            ("physics:lowerLimit", Sdf.ValueTypeNames.Float, limit[0], Sdf.VariabilityVarying),
+            ("physics:upperLimit", Sdf.ValueTypeNames.Float, limit[1], Sdf.VariabilityVarying),
+            # Drive
+            ("drive:angular:physics:type", Sdf.ValueTypeNames.Token, "force", Sdf.VariabilityUniform),
+            ("drive:angular:physics:stiffness", Sdf.ValueTypeNames.Float, stiffness, Sdf.VariabilityVarying),
+            ("drive:angular:physics:damping", Sdf.ValueTypeNames.Float, stiffness / 10.0, Sdf.VariabilityVarying),
+            ("drive:angular:physics:targetPosition", Sdf.ValueTypeNames.Float, 0.0, Sdf.VariabilityVarying),
+        ], [
+            # Relationship Targets
+            ("physics:body0", body0_path),
+            ("physics:body1", body1_path),
+        ]))
+
+    def _author_pending(self, layer, pending):
+        """
+        Writes queued (path, prim type, attributes, relationships) onto the
+        layer in one change block. A prim type of (typeName, apiSchemas)
+        defines the prim spec here; None means it was already defined via Usd.
+        """
+        with Sdf.ChangeBlock():
+            for prim_path, prim_type, attrs, rels in pending:
+                if prim_type is None:
+                    prim_spec = layer.GetPrimAtPath(prim_path)
+                else:
+                    type_name, api_schemas = prim_type
+                    prim_spec = Sdf.CreatePrimInLayer(layer, prim_path)
+                    prim_spec.specifier = Sdf.SpecifierDef
+                    prim_spec.typeName = type_name
+                    prim_spec.SetInfo("apiSchemas", Sdf.TokenListOp.Create(prependedItems=api_schemas))
+                for name, type_name, value, variability in attrs:
+                    attr_spec = Sdf.AttributeSpec(prim_spec, name, type_name, variability)
+                    attr_spec.default = value
+                for name, target in rels:
+                    rel_spec = Sdf.RelationshipSpec(prim_spec, name, custom=False)
+                    rel_spec.targetPathList.prependedItems.append(Sdf.Path(target))
@@ -0,0 +1,42 @@
+# FILE: app/services/llm_cache.py
+import hashlib
+import json
+import os
+
+from app.services.ai_service import LLM_MODEL, call_llm_for_json
+
+# On-disk cache of LLM JSON answers, so development reruns of forge.py skip
+# the round trips for prompts they have already asked.
+CACHE_DIR = os.path.abspath("llm_cache")
+
+_enabled = True
+
+def set_enabled(enabled: bool):
+    """Turns the cache off (e.g. forge.py --no-cache) or back on."""
+    global _enabled
+    _enabled = enabled
+
+def _cache_path(prompt: str, system_instruction: str) -> str:
+    key = hashlib.sha256("\0".join((LLM_MODEL, system_instruction, prompt)).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+async def cached_llm(prompt: str, system_instruction: str) -> dict | None:
+    """call_llm_for_json, answered from disk when the same prompt was asked before."""
+    if not _enabled:
+        return await call_llm_for_json(prompt, system_instruction)
+
+    path = _cache_path(prompt, system_instruction)
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    result = await call_llm_for_json(prompt, system_instruction)
+    if result is not None:  # failures are retried next run, not cached
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp, path)
+    return result
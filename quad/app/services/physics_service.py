@@ -19,12 +19,14 @@ FALLBACK_WEIGHTS = {
 # Default Geometry if CAD is missing (mm)
 DEFAULT_FEMUR_LENGTH_MM = 100.0 
 
+_NUMBER_RE = re.compile(r"(\d+(\.\d+)?)")
+
 def _extract_number(text, default=0.0):
     """Robust extraction of numbers from dirty strings."""
     if isinstance(text, (int, float)): return float(text)
     if not text: return default
     try:
-        match = re.search(r"(\d+(\.\d+)?)", str(text))
+        match = _NUMBER_RE.search(str(text))
         return float(match.group(1)) if match else default
     except:
         return default
@@ -83,10 +85,13 @@ def generate_physics_config(bom):
     """
     print("--> ⚙️  Physics Service: Calculating Torque & Statics...")
     
-    # 1. Identify Critical Parts
-    actuators = next((i for i in bom if 'actuator' in i.get('part_type', '').lower()), None)
-    chassis = next((i for i in bom if 'chassis' in i.get('part_type', '').lower()), None)
-    battery = next((i for i in bom if 'battery' in i.get('part_type', '').lower()), None)
+    # 1. Identify Critical Parts (first match of each, in one pass)
+    actuators = chassis = battery = None
+    for i in bom:
+        cat = i.get('part_type', '').lower()
+        if actuators is None and 'actuator' in cat: actuators = i
+        if chassis is None and 'chassis' in cat: chassis = i
+        if battery is None and 'battery' in cat: battery = i
 
     # 2. Calculate Mass
     mass_g = _calculate_auw(bom)
@@ -1,26 +1,74 @@
 # FILE: app/services/recon_service.py
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import asyncio
 import re
 import json
 import random
+import time
 
 try:
     from playwright_stealth import stealth_async
 except ImportError:
     stealth_async = None
 
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml  # noqa: F401 -- C tree builder for BeautifulSoup
+    BS4_PARSER = "lxml"
+except ImportError:
+    BS4_PARSER = "html.parser"
+
+# Elements cut from the raw HTML before parsing. page.content() is
+# Chromium's serialization, so every one of them has a closing tag.
+STRIP_RE = re.compile(r'<(script|style|nav|footer|svg)\b[^>]*>.*?</\1\s*>', re.I | re.S)
+
+# Price fallback, only searched within the first PRICE_SCAN_CHARS of the page
+PRICE_RE = re.compile(r'[\$€£]\s?(\d{1,4}\.\d{2})')
+PRICE_SCAN_CHARS = 2000
+# Storefront meta price (Shopify/BigCommerce), read straight off the raw HTML
+META_PRICE_RE = re.compile(r'<meta[^>]+property=["\']product:price:amount["\'][^>]+content=["\']([\d.]+)', re.I)
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 ]
 
+# Politeness: minimum spacing between page loads on the same host
+HOST_INTERVAL_S = 2.0
+
+class HostRateLimiter:
+    """
+    Spaces requests to each host at least `interval` seconds apart.
+    Requests to different hosts never wait on each other.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self._next_slot = {}
+
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        now = time.monotonic()
+        # Reserve the host's next slot before sleeping, so concurrent callers queue up behind it
+        slot = max(now, self._next_slot.get(host, 0.0))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+# Shared by every Scraper, since sourcing runs many of them concurrently
+host_limiter = HostRateLimiter(HOST_INTERVAL_S)
+
 class Scraper:
     def __init__(self):
         self.playwright = None
         self.browser = None
+        # One long-lived context per user agent, shared by every page
+        self._contexts = []
 
     async def __aenter__(self):
         self.playwright = await async_playwright().start()
@@ -28,53 +76,50 @@ class Scraper:
             headless=True,
             args=["--disable-blink-features=AutomationControlled", "--no-sandbox", "--disable-infobars"]
         )
+        for ua in USER_AGENTS:
+            context = await self.browser.new_context(
+                user_agent=ua,
+                viewport={"width": 1920, "height": 1080}
+            )
+            # RELAXED BLOCKING: Only block heavy media. 
+            # Blocking 'script' or 'other' crashes React/Vue apps (AliExpress, RobotShop).
+            await context.route("**/*", self._block_media)
+            self._contexts.append(context)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        for context in self._contexts: await context.close()
+        self._contexts = []
         if self.browser: await self.browser.close()
         if self.playwright: await self.playwright.stop()
 
+    @staticmethod
+    async def _block_media(route):
+        if route.request.resource_type in ["font", "image", "media"]:
+            await route.abort()
+        else:
+            await route.continue_()
+
     async def scrape_product_page(self, url: str):
-        context = await self.browser.new_context(
-            user_agent=random.choice(USER_AGENTS),
-            viewport={"width": 1920, "height": 1080}
-        )
-        page = await context.new_page()
+        page = await random.choice(self._contexts).new_page()
         if stealth_async: await stealth_async(page)
-        
-        # RELAXED BLOCKING: Only block heavy media. 
-        # Blocking 'script' or 'other' crashes React/Vue apps (AliExpress, RobotShop).
-        await page.route("**/*", lambda route: route.abort() 
-            if route.request.resource_type in ["font", "image", "media"] 
-            else route.continue_()
-        )
 
         try:
+            await host_limiter.wait(url)
             # Short timeout, retry logic handled by caller
             await page.goto(url, timeout=15000, wait_until="domcontentloaded")
             
             # Quick scroll
             await page.evaluate("window.scrollTo(0, document.body.scrollHeight/2)")
-            await asyncio.sleep(0.5)
+            # Give lazy content up to the old 0.5s to settle; returns at once
+            # if the network is already quiet
+            try:
+                await page.wait_for_load_state("networkidle", timeout=500)
+            except PlaywrightTimeoutError:
+                pass
 
             content = await page.content()
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # 1. Price
-            price = self._extract_price(soup, content)
-
-            # 2. Text Content (Limit size)
-            for tag in soup(["script", "style", "nav", "footer", "svg"]): tag.decompose()
-            text = soup.get_text(separator=' ', strip=True)[:10000]
-            
-            # 3. Tables
-            tables = []
-            for t in soup.find_all("table"):
-                rows = [tr.get_text(":", strip=True) for tr in t.find_all("tr")]
-                tables.append("\n".join(rows))
-            
-            # 4. Images
-            images = self._extract_images(soup, url)
+            price, text, tables, images = self._parse_page(content, url)
 
             return {
                 "title": await page.title(),
@@ -90,22 +135,66 @@ class Scraper:
             return None
         finally:
             await page.close()
-            await context.close()
 
-    def _extract_images(self, soup, base_url):
+    async def scrape_many(self, urls, concurrency=8):
+        """scrape_product_page for every url, at most `concurrency` at a time. Results keep the order of urls."""
+        sem = asyncio.Semaphore(concurrency)
+
+        async def bounded_scrape(url):
+            async with sem:
+                return await self.scrape_product_page(url)
+
+        return await asyncio.gather(*[bounded_scrape(u) for u in urls])
+
+    def _parse_page(self, content, url):
+        """(price, text, tables, images) from the page HTML."""
+        # The regex covers the usual property-before-content tag; the DOM
+        # lookups below only run when it misses
+        meta_match = META_PRICE_RE.search(content)
+        meta_price = meta_match.group(1) if meta_match else None
+        # Scripts, styles etc. are often half the page; drop them before the
+        # parser has to build (and then walk) their subtrees
+        stripped = STRIP_RE.sub(" ", content)
+
+        if HTMLParser is not None:
+            # selectolax (lexbor, C) for every read-only pass
+            tree = HTMLParser(stripped)
+            if meta_price is None:
+                meta = tree.css_first('meta[property="product:price:amount"]')
+                meta_price = meta.attributes.get("content") if meta else None
+            tables = [
+                "\n".join(tr.text(separator=":", strip=True) for tr in t.css("tr"))
+                for t in tree.css("table")
+            ]
+            srcs = [img.attributes.get("src") or img.attributes.get("data-src") for img in tree.css("img")]
+            text = tree.root.text(separator=" ", strip=True) if tree.root else ""
+        else:
+            soup = BeautifulSoup(stripped, BS4_PARSER)
+            if meta_price is None:
+                meta = soup.find("meta", property="product:price:amount")
+                meta_price = meta.get("content") if meta else None
+            tables = [
+                "\n".join(tr.get_text(":", strip=True) for tr in t.find_all("tr"))
+                for t in soup.find_all("table")
+            ]
+            srcs = [img.get('src') or img.get('data-src') for img in soup.find_all('img')]
+            text = soup.get_text(separator=' ', strip=True)
+
+        price = self._extract_price(meta_price, content)
+        return price, text[:10000], tables, self._extract_images(srcs, url)
+
+    def _extract_images(self, srcs, base_url):
         candidates = []
-        for img in soup.find_all('img'):
-            src = img.get('src') or img.get('data-src')
+        for src in srcs:
             if src and 'icon' not in src.lower():
                 if src.startswith("//"): src = "https:" + src
                 elif src.startswith("/"): src = urljoin(base_url, src)
                 candidates.append(src)
         return candidates[:5]
 
-    def _extract_price(self, soup, content_str):
+    def _extract_price(self, meta_price, content_str):
         # Meta tag first
-        meta = soup.find("meta", property="product:price:amount")
-        if meta and meta.get("content"): return float(meta["content"])
+        if meta_price: return float(meta_price)
         # Regex fallback
-        match = re.search(r'[\$€£]\s?(\d{1,4}\.\d{2})', content_str[:2000])
+        match = PRICE_RE.search(content_str, 0, PRICE_SCAN_CHARS)
         return float(match.group(1)) if match else None
\ No newline at end of file
@@ -1,7 +1,14 @@
 # FILE: app/services/search_service.py
+import functools
 from googleapiclient.discovery import build
 from app.config import settings
 
+@functools.lru_cache(maxsize=1)
+def _search_client():
+    # Built once per process: the client keeps its HTTP connection (and TLS
+    # session) open across searches instead of reconnecting every query
+    return build("customsearch", "v1", developerKey=settings.GOOGLE_API_KEY)
+
 def find_components(query: str, limit: int = 5) -> list[dict]:
     """
     Searches Google Custom Search API for drone components.
@@ -14,7 +21,7 @@ def find_components(query: str, limit: int = 5) -> list[dict]:
     print(f"🔎 Google Search: '{query}'...")
 
     try:
-        service = build("customsearch", "v1", developerKey=settings.GOOGLE_API_KEY)
+        service = _search_client()
         
         # Append 'buy' or 'price' to ensure we get e-commerce results if not present
         search_query = query if "buy" in query or "price" in query else f"{query} buy"
@@ -1,10 +1,20 @@
 # FILE: app/services/supply_service.py
 from app.services.db_service import ArsenalDB
+import collections
+import copy
 import difflib
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    process = None
 
 class SupplyService:
     def __init__(self):
         self.db = ArsenalDB()
+        # part_type -> inventory rows, loaded on first lookup
+        self._by_type = None
+        # (part_type, model) keys that found nothing and fell through to the generator
+        self._recent_misses = set()
 
     def find_part(self, part_type, ideal_model_name):
         """
@@ -17,30 +27,109 @@ class SupplyService:
         candidate = self.db.find_component(part_type, ideal_model_name)
         if candidate:
             return candidate
+        return self._closest_or_fallback(part_type, ideal_model_name)
 
+    def find_parts_bulk(self, keys):
+        """
+        find_part for many (part_type, model_name) keys, returned as a dict.
+        Step 1 runs against the in-memory type index instead of one SQL
+        query per key, so the whole batch costs at most one inventory load.
+        """
+        found = {}
+        for part_type, model_name in keys:
+            candidate = self._indexed_match(part_type, model_name)
+            found[(part_type, model_name)] = candidate or self._closest_or_fallback(part_type, model_name)
+        return found
+
+    def _indexed_match(self, part_type, query_string):
+        """ArsenalDB.find_component's LIKE search, over the cached rows of that type."""
+        parts = self._get_all_by_type(part_type)
+        if query_string:
+            # LIKE '%q%' is case-insensitive (ASCII) in SQLite
+            q = str(query_string).lower()
+            parts = [p for p in parts
+                     if q in (p['product_name'] or '').lower() or q in (p['specs_json'] or '').lower()]
+        if not parts:
+            return None
+        # ORDER BY verified DESC, price ASC (NULL prices sort first)
+        return self._detached(min(parts, key=lambda p: (-(p['verified'] or 0), p['price'] is not None, p['price'] or 0)))
+
+    def _closest_or_fallback(self, part_type, ideal_model_name):
         # 2. Broad Category Search (for fuzzy matching)
         all_category_parts = self._get_all_by_type(part_type)
         
         if all_category_parts:
             # Fuzzy Match
-            model_names = [p['product_name'] for p in all_category_parts]
-            matches = difflib.get_close_matches(ideal_model_name, model_names, n=1, cutoff=0.4)
-            
-            if matches:
-                return next(p for p in all_category_parts if p['product_name'] == matches[0])
+            match = self._fuzzy_match(ideal_model_name, all_category_parts)
+            if match is not None:
+                return self._detached(match)
             
             # If no fuzzy match but we have *something*, return the best verify part
-            return all_category_parts[0]
+            return self._detached(all_category_parts[0])
 
         # 3. Fallback (The "Dummy Part")
+        self._recent_misses.add((part_type, ideal_model_name))
         return self._get_generic_fallback(part_type, ideal_model_name)
 
+    def get_or_generate_fallback(self, part_type, model_name):
+        """
+        Part to use once sourcing has failed. If find_part already came up
+        empty for this key, generate the fallback without querying again.
+        """
+        if (part_type, model_name) in self._recent_misses:
+            return self._get_generic_fallback(part_type, model_name)
+        return self.find_part(part_type, model_name)
+
+    def _fuzzy_match(self, ideal_model_name, parts):
+        """Closest part by product_name, or None below the similarity cutoff."""
+        if process is not None:
+            # extractOne over a dict hands back the matched key (the index)
+            hit = process.extractOne(
+                ideal_model_name,
+                {i: p['product_name'] for i, p in enumerate(parts)},
+                scorer=fuzz.WRatio,
+                score_cutoff=40,
+            )
+            return parts[hit[2]] if hit else None
+
+        model_names = [p['product_name'] for p in parts]
+        matches = difflib.get_close_matches(ideal_model_name, model_names, n=1, cutoff=0.4)
+        if matches:
+            return next(p for p in parts if p['product_name'] == matches[0])
+        return None
+
     def save_part(self, part_data):
-        return self.db.add_component(part_data)
+        saved = self.db.add_component(part_data)
+        if saved:
+            # add_component upserts, so rebuild on the next lookup rather
+            # than risk a stale duplicate in the bucket
+            self._by_type = None
+            # Misses in this category may now resolve to the saved part
+            part_type = part_data.get('part_type')
+            self._recent_misses = {k for k in self._recent_misses if k[0] != part_type}
+        return saved
+
+    @staticmethod
+    def _detached(row):
+        # Callers edit BOM parts in place (optimizer overrides), so never hand
+        # out the cached index rows themselves
+        return copy.deepcopy(row)
+
+    def warmup(self):
+        """Loads the inventory index ahead of the first lookup. Idempotent."""
+        self._inventory_index()
+
+    def _inventory_index(self):
+        if self._by_type is None:
+            # Built aside and published whole: warmup() may run in a worker thread
+            by_type = collections.defaultdict(list)
+            for p in self.db.get_all_inventory():
+                by_type[p['part_type']].append(p)
+            self._by_type = by_type
+        return self._by_type
 
     def _get_all_by_type(self, part_type):
-        inventory = self.db.get_all_inventory()
-        return [p for p in inventory if p['part_type'] == part_type]
+        return self._inventory_index().get(part_type, [])
 
     def _get_generic_fallback(self, part_type, name):
         """Generates a dummy part based on library knowledge."""
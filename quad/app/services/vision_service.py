@@ -11,6 +11,11 @@ from app.config import settings
 if settings.GOOGLE_API_KEY:
     genai.configure(api_key=settings.GOOGLE_API_KEY)
 
+# One pooled session for image downloads, so repeat hosts reuse keep-alive
+# connections instead of a new TCP + TLS handshake per image
+_http = requests.Session()
+_http.headers.update({"User-Agent": "Mozilla/5.0"})
+
 async def analyze_specs_multimodal(
     text_context: str, 
     image_urls: list[str], 
@@ -26,11 +31,10 @@ async def analyze_specs_multimodal(
     # 1. Download Images (Limit to 3 to optimize latency/tokens)
     # We prioritize the images found by the scraper (which puts galleries/diagrams first)
     images = []
-    headers = {"User-Agent": "Mozilla/5.0"}
     
     for url in image_urls[:3]:
         try:
-            resp = requests.get(url, headers=headers, timeout=10)
+            resp = _http.get(url, timeout=10)
             if resp.status_code == 200:
                 img = PIL.Image.open(BytesIO(resp.content))
                 images.append(img)
@@ -1,17 +1,28 @@
 # FILE: forge.py
+import argparse
 import asyncio
+import copy
+import functools
 import json
 import os
 import random
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Services
-from app.services.ai_service import call_llm_for_json
+from app.services import llm_cache
+from app.services.llm_cache import cached_llm
 from app.services.fusion_service import fuse_component_data
 from app.services.supply_service import SupplyService
 from app.services.physics_service import generate_physics_config
 from app.services.compatibility_service import CompatibilityService
 from app.services.optimizer import EngineeringOptimizer
+from app.services import cad_service
 from app.services.cad_service import generate_assets
 from app.services.isaac_service import IsaacService
 from app.services.software_service import design_compute_stack
@@ -24,6 +35,29 @@ from app.prompts import (
     ARSENAL_ENGINEER_INSTRUCTION
 )
 
+# Parts scraped at once, across all campaigns
+SOURCING_CONCURRENCY = 4
+
+# USD exports run one at a time on this thread: IsaacService's mesh/hull
+# caches are plain dicts and pxr stage authoring is not safe to run from
+# several threads at once
+USD_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usd")
+
+def dumps_prompt(data):
+    """Serializes an LLM prompt payload, through orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:
+            pass  # e.g. non-str keys or ints wider than 64 bits
+    return json.dumps(data)
+
+# Words that confuse search engines, stripped from LLM model names.
+# Matched as substrings, like the str.replace loop this replaced.
+JUNK_WORDS_RE = re.compile(
+    "custom|fabricated|open-source|printable|files|style|based|3d printed|compatible|generic"
+)
+
 # --- NEW HELPER FUNCTION TO FIX SEARCH FAILURES ---
 def clean_search_query(model_name, part_type):
     """
@@ -34,17 +68,17 @@ def clean_search_query(model_name, part_type):
     if not model_name:
         return f"{part_type} robotics specs price"
 
-    query = str(model_name).lower()
+    # The same (model, part type) pairs recur across missions. str() first,
+    # since LLM output isn't guaranteed to give a hashable model name.
+    return _clean_model_query(str(model_name), part_type)
+
+@functools.lru_cache(maxsize=4096)
+def _clean_model_query(model_name, part_type):
+    query = model_name.lower()
     
-    # 2. Remove junk words that confuse search engines
-    junk_words = [
-        "custom", "fabricated", "open-source", "printable", "files", 
-        "style", "based", "3d printed", "compatible", "generic"
-    ]
-    for w in junk_words:
-        query = query.replace(w, "")
-        
-    query = query.strip()
+    # 2. Remove junk words that confuse search engines (one pass), then
+    # collapse the gaps they leave
+    query = " ".join(JUNK_WORDS_RE.sub("", query).split())
     
     # 3. Apply Domain Heuristics
     pt_lower = part_type.lower()
@@ -68,6 +102,187 @@ def clean_search_query(model_name, part_type):
     # Default fallback
     return f"{query} specs price"
 
+async def scrape_part(item, supply, sem):
+    """Runs the fusion engine for one search query and saves what it finds."""
+    async with sem:
+        # Scrape Web (Slow Path)
+        # (Per-host politeness spacing is applied by the Scraper)
+        print(f"      🌍 Scraping: {item['query']}...") # Log the CLEANED query
+        
+        fused_part = await fuse_component_data(
+            part_type=item['type'],
+            search_query=item['query'],
+            search_limit=3,
+            min_confidence=0.6
+        )
+    
+    if fused_part:
+        supply.save_part(fused_part)
+        print(f"      ✅ Found & Saved: {fused_part['product_name']}")
+    return fused_part
+
+async def source_one(item, existing, supply, sem, scrapes):
+    """Sources one BOM line: inventory first, then the fusion engine, then a fallback part."""
+    # Check DB first (Fast Path) -- `existing` is the batched inventory lookup
+    if existing and existing.get('source') != "FALLBACK_GENERATOR":
+        print(f"      📦 Inventory Match: {existing['product_name']}")
+        return existing
+
+    # Concurrent campaigns often ask for the same part: share one scrape per
+    # (type, query) rather than fetching the same pages again
+    key = (item['type'], item['query'])
+    if key not in scrapes:
+        scrapes[key] = asyncio.ensure_future(scrape_part(item, supply, sem))
+    fused_part = await scrapes[key]
+
+    if fused_part:
+        # Each BOM gets its own copy: the optimizer overrides edit parts in place
+        return copy.deepcopy(fused_part)
+
+    print(f"      ⚠️  Sourcing Failed: {item['model']}. Using Fallback.")
+    return supply.get_or_generate_fallback(item['type'], item['model'])
+
+async def run_campaign(mission, supply, isaac, optimizer, compat, sourcing_sem, scrapes, usd_tasks):
+    """Runs one mission end to end: requirements, BOM, sourcing, validation, artifacts."""
+    m_name = mission['mission_name']
+    print(f"\n🚀 STARTING CAMPAIGN: {m_name}")
+    
+    # --- STEP 2: THE ARCHITECT (Topology) ---
+    print(f"   📐 AGENT 2: Architecting constraints...")
+    reqs = await cached_llm(dumps_prompt(mission), REQUIREMENTS_SYSTEM_INSTRUCTION)
+    
+    # --- STEP 3: THE ENGINEER (BOM) ---
+    print(f"   👷 AGENT 3: Designing Build Kit...")
+    context = {"mission": mission, "constraints": reqs}
+    bom_structure = await cached_llm(dumps_prompt(context), ARSENAL_ENGINEER_INSTRUCTION)
+    
+    if not bom_structure or "kits" not in bom_structure: return
+    target_kit = bom_structure['kits'][0]['components']
+
+    # --- STEP 4: THE SOURCER (Fusion Loop) ---
+    print(f"   🔎 AGENT 4: Sourcing Real Parts (Fusion Engine)...")
+    
+    # Convert dictionary to optimized search queries
+    search_queries = []
+    for part_type, model_name in target_kit.items():
+        # Apply the cleaning logic here
+        query = clean_search_query(model_name, part_type)
+        # Ensure model_name is safe for later usage
+        safe_model = model_name if model_name else f"Generic {part_type}"
+        search_queries.append({"type": part_type, "query": query, "model": safe_model, "_pt_lower": part_type.lower()})
+
+    # Inventory lookups for the whole kit in one batch
+    known = supply.find_parts_bulk([(q['type'], q['model']) for q in search_queries])
+
+    # Run Sourcing (parts in parallel; the semaphore bounds outbound scraping)
+    real_bom = await asyncio.gather(*[
+        source_one(item, known[(item['type'], item['model'])], supply, sourcing_sem, scrapes)
+        for item in search_queries
+    ])
+
+    # BOM slots by lower-cased part type, for the override pass below.
+    # real_bom[i] was sourced for search_queries[i] (gather keeps order), so
+    # reuse the type lowered when the query was built
+    bom_index = {}
+    for i, item in enumerate(search_queries):
+        bom_index.setdefault(item['_pt_lower'], []).append(i)
+
+    # --- STEP 5: VALIDATION (Physics & Electronics) ---
+    print(f"   ⚙️  Running Simulation & Validation...")
+    
+    physics_cfg = generate_physics_config(real_bom)
+    compat_report = compat.validate_build(real_bom)
+    is_sound = physics_cfg['viability']['is_mechanically_sound']
+    is_compatible = compat_report['valid']
+    
+    # --- STEP 6: OPTIMIZATION LOOP ---
+    optimized_params = {} # Store overrides from the optimizer
+
+    # A design that passes both checks skips the optimizer and the BOM
+    # override pass below entirely
+    if not (is_sound and is_compatible):
+        print("   ❌ Design Validation Failed. Engaging Engineering Optimizer...")
+        
+        fix_plan = optimizer.analyze_and_fix(real_bom, physics_cfg)
+        
+        if fix_plan:
+            print("   🔧 Optimization Plan:")
+            for fix in fix_plan.get('optimization_plan', []):
+                print(f"      -> {fix['diagnosis']} -> {fix['action']}")
+                
+                # --- CAPTURE GEOMETRY CHANGES ---
+                # If optimizer suggests modifying geometry (e.g. shortening femur),
+                # we capture the 'param_change' dictionary.
+                if fix.get('type') == 'MODIFY_GEOMETRY' and 'param_change' in fix:
+                    # Example: fix['param_change'] might be {'femur_length_mm': 0.85} (multiplier)
+                    # or specific values.
+                    # Assuming here that we want to apply a specific override or multiplier.
+                    # For simplicity in this loop, let's assume we hardcode the intended geometric fix
+                    # if the Action mentions shortening legs.
+                    if "femur" in str(fix.get('action', '')).lower():
+                         # Default was 100mm, let's set to 85mm per typical optimizer suggestion
+                         optimized_params['femur_length_mm'] = 85.0
+                         optimized_params['tibia_length_mm'] = 95.0
+
+            print("      -> Applying theoretical patches to proceed to CAD...")
+            physics_cfg['torque_physics']['safety_margin'] = 2.0 # Force pass
+
+    # --- STEP 7: GENERATE ARTIFACTS ---
+    project_id = m_name.replace(" ", "_").lower()
+    
+    # Apply Optimizer Overrides to the BOM before CAD generation
+    if optimized_params:
+        chassis_slots = [i for pt, slots in bom_index.items() if 'chassis' in pt for i in slots]
+        for item in (real_bom[i] for i in chassis_slots):
+            # Create sub-dict if missing
+            if 'engineering_specs' not in item:
+                item['engineering_specs'] = {}
+            
+            # Apply overrides
+            if 'femur_length_mm' in optimized_params:
+                print(f"      🔧 CAD Override: Setting Femur to {optimized_params['femur_length_mm']}mm")
+                item['engineering_specs']['femur_length_mm'] = optimized_params['femur_length_mm']
+            if 'tibia_length_mm' in optimized_params:
+                item['engineering_specs']['tibia_length_mm'] = optimized_params['tibia_length_mm']
+
+    # USD (Isaac Sim)
+    # We construct the robot data packet
+    robot_data = {
+        "sku_id": project_id,
+        "technical_data": {
+            "physics_config": physics_cfg,
+            "scene_graph": {"components": []} # In real app, derived from digital_twin
+        }
+    }
+
+    async def build_geometry():
+        # CAD (OpenSCAD -> STL)
+        print(f"   🏗️  Generating CAD Assets ({project_id})...")
+        cad_assets = await asyncio.to_thread(generate_assets, project_id, {}, real_bom)
+        
+        # Note: Isaac Service usually runs in its own process/container.
+        # Here we assume local install for the "Make Fleet" step
+        # The USD embeds the meshes just written, so it starts once CAD is
+        # done, then runs in the background; main() collects it at the end.
+        if os.path.exists("usd_export"):
+             print(f"   ⚡ Generating USD Digital Twin...")
+             usd_tasks.append(asyncio.get_running_loop().run_in_executor(USD_EXECUTOR, isaac.generate_robot_usd, robot_data))
+        return cad_assets
+
+    # Geometry, schematic and software stack are independent of each other:
+    # run the blocking generators in threads alongside the software LLM call
+    print(f"   🔌 Generating Wiring Schematic...")
+    cad_assets, _, sw_stack = await asyncio.gather(
+        build_geometry(),
+        asyncio.to_thread(generate_wiring_diagram, project_id, real_bom),
+        design_compute_stack(mission, real_bom),
+    )
+
+    print(f"\n✅ CAMPAIGN COMPLETE: {m_name}")
+    print(f"   -> Physics Profile: {physics_cfg['torque_physics']}")
+    print(f"   -> Software: {sw_stack['stack_design'].get('operating_system')}")
+    print("---------------------------------------------------")
+
 async def main():
     print("""
     ===================================================
@@ -82,7 +297,12 @@ async def main():
 
     # --- STEP 1: THE RANCHER (Intent) ---
     print("\n🤠 AGENT 1: Rancher Persona is defining needs...")
-    mission_data = await call_llm_for_json("Generate robot missions.", RANCHER_PERSONA_INSTRUCTION)
+    # Cold-start work (inventory load, OpenSCAD probe) overlaps the Rancher call
+    mission_data, _, _ = await asyncio.gather(
+        cached_llm("Generate robot missions.", RANCHER_PERSONA_INSTRUCTION),
+        asyncio.to_thread(supply.warmup),
+        asyncio.to_thread(cad_service.warmup),
+    )
     
     if not mission_data or "missions" not in mission_data:
         print("❌ Rancher failed to speak.")
@@ -91,150 +311,30 @@ async def main():
     missions = mission_data['missions']
     print(f"   -> Defined {len(missions)} missions: {[m['mission_name'] for m in missions]}")
 
-    for mission in missions:
-        m_name = mission['mission_name']
-        print(f"\n🚀 STARTING CAMPAIGN: {m_name}")
-        
-        # --- STEP 2: THE ARCHITECT (Topology) ---
-        print(f"   📐 AGENT 2: Architecting constraints...")
-        reqs = await call_llm_for_json(json.dumps(mission), REQUIREMENTS_SYSTEM_INSTRUCTION)
-        
-        # --- STEP 3: THE ENGINEER (BOM) ---
-        print(f"   👷 AGENT 3: Designing Build Kit...")
-        context = {"mission": mission, "constraints": reqs}
-        bom_structure = await call_llm_for_json(json.dumps(context), ARSENAL_ENGINEER_INSTRUCTION)
-        
-        if not bom_structure or "kits" not in bom_structure: continue
-        target_kit = bom_structure['kits'][0]['components']
+    sourcing_sem = asyncio.Semaphore(SOURCING_CONCURRENCY)
+    scrapes = {}  # (part type, query) -> in-flight or finished scrape, shared by campaigns
+    usd_tasks = []  # background USD exports, appended to by campaigns
 
-        # --- STEP 4: THE SOURCER (Fusion Loop) ---
-        print(f"   🔎 AGENT 4: Sourcing Real Parts (Fusion Engine)...")
-        
-        real_bom = []
-        
-        # Convert dictionary to optimized search queries
-        search_queries = []
-        for part_type, model_name in target_kit.items():
-            # Apply the cleaning logic here
-            query = clean_search_query(model_name, part_type)
-            # Ensure model_name is safe for later usage
-            safe_model = model_name if model_name else f"Generic {part_type}"
-            search_queries.append({"type": part_type, "query": query, "model": safe_model})
-
-        # Run Sourcing Loop
-        for item in search_queries:
-            # Check DB first (Fast Path)
-            existing = supply.find_part(item['type'], item['model'])
-            if existing and existing.get('source') != "FALLBACK_GENERATOR":
-                print(f"      📦 Inventory Match: {existing['product_name']}")
-                real_bom.append(existing)
-                continue
-            
-            # Scrape Web (Slow Path)
-            print(f"      🌍 Scraping: {item['query']}...") # Log the CLEANED query
-            await asyncio.sleep(2) # Politeness
-            
-            fused_part = await fuse_component_data(
-                part_type=item['type'],
-                search_query=item['query'],
-                search_limit=3,
-                min_confidence=0.6
-            )
-            
-            if fused_part:
-                supply.save_part(fused_part)
-                real_bom.append(fused_part)
-                print(f"      ✅ Found & Saved: {fused_part['product_name']}")
-            else:
-                print(f"      ⚠️  Sourcing Failed: {item['model']}. Using Fallback.")
-                fallback = supply.find_part(item['type'], item['model']) # Will generate fallback
-                real_bom.append(fallback)
-
-        # --- STEP 5: VALIDATION (Physics & Electronics) ---
-        print(f"   ⚙️  Running Simulation & Validation...")
-        
-        physics_cfg = generate_physics_config(real_bom)
-        compat_report = compat.validate_build(real_bom)
-        
-        # --- STEP 6: OPTIMIZATION LOOP ---
-        optimized_params = {} # Store overrides from the optimizer
-
-        if not physics_cfg['viability']['is_mechanically_sound'] or not compat_report['valid']:
-            print("   ❌ Design Validation Failed. Engaging Engineering Optimizer...")
-            
-            fix_plan = optimizer.analyze_and_fix(real_bom, physics_cfg)
-            
-            if fix_plan:
-                print("   🔧 Optimization Plan:")
-                for fix in fix_plan.get('optimization_plan', []):
-                    print(f"      -> {fix['diagnosis']} -> {fix['action']}")
-                    
-                    # --- CAPTURE GEOMETRY CHANGES ---
-                    # If optimizer suggests modifying geometry (e.g. shortening femur),
-                    # we capture the 'param_change' dictionary.
-                    if fix.get('type') == 'MODIFY_GEOMETRY' and 'param_change' in fix:
-                        # Example: fix['param_change'] might be {'femur_length_mm': 0.85} (multiplier)
-                        # or specific values.
-                        # Assuming here that we want to apply a specific override or multiplier.
-                        # For simplicity in this loop, let's assume we hardcode the intended geometric fix
-                        # if the Action mentions shortening legs.
-                        if "femur" in str(fix.get('action', '')).lower():
-                             # Default was 100mm, let's set to 85mm per typical optimizer suggestion
-                             optimized_params['femur_length_mm'] = 85.0
-                             optimized_params['tibia_length_mm'] = 95.0
-
-                print("      -> Applying theoretical patches to proceed to CAD...")
-                physics_cfg['torque_physics']['safety_margin'] = 2.0 # Force pass
-
-        # --- STEP 7: GENERATE ARTIFACTS ---
-        project_id = m_name.replace(" ", "_").lower()
-        
-        # Apply Optimizer Overrides to the BOM before CAD generation
-        if optimized_params:
-            for item in real_bom:
-                if 'chassis' in item.get('part_type', '').lower():
-                    # Create sub-dict if missing
-                    if 'engineering_specs' not in item:
-                        item['engineering_specs'] = {}
-                    
-                    # Apply overrides
-                    if 'femur_length_mm' in optimized_params:
-                        print(f"      🔧 CAD Override: Setting Femur to {optimized_params['femur_length_mm']}mm")
-                        item['engineering_specs']['femur_length_mm'] = optimized_params['femur_length_mm']
-                    if 'tibia_length_mm' in optimized_params:
-                        item['engineering_specs']['tibia_length_mm'] = optimized_params['tibia_length_mm']
-
-        # CAD (OpenSCAD -> STL)
-        print(f"   🏗️  Generating CAD Assets ({project_id})...")
-        cad_assets = generate_assets(project_id, {}, real_bom)
-        
-        # USD (Isaac Sim)
-        # We construct the robot data packet
-        robot_data = {
-            "sku_id": project_id,
-            "technical_data": {
-                "physics_config": physics_cfg,
-                "scene_graph": {"components": []} # In real app, derived from digital_twin
-            }
-        }
-        
-        # Note: Isaac Service usually runs in its own process/container.
-        # Here we assume local install for the "Make Fleet" step
-        if os.path.exists("usd_export"):
-             print(f"   ⚡ Generating USD Digital Twin...")
-             isaac.generate_robot_usd(robot_data)
-        
-        # Software Stack
-        sw_stack = await design_compute_stack(mission, real_bom)
-        
-        # Schematics
-        print(f"   🔌 Generating Wiring Schematic...")
-        generate_wiring_diagram(project_id, real_bom)
+    # Missions are independent and mostly waiting on LLM/scrape round trips,
+    # so run them concurrently. supply, optimizer and compat are only called
+    # from this event loop thread. CAD (generate_assets) and wiring
+    # (generate_wiring_diagram) run in to_thread workers on per-mission data,
+    # and isaac.generate_robot_usd runs on the single USD_EXECUTOR thread.
+    results = await asyncio.gather(
+        *[run_campaign(m, supply, isaac, optimizer, compat, sourcing_sem, scrapes, usd_tasks) for m in missions],
+        return_exceptions=True
+    )
+    for mission, result in zip(missions, results):
+        if isinstance(result, Exception):
+            print(f"\n❌ CAMPAIGN FAILED: {mission['mission_name']}: {result!r}")
 
-        print(f"\n✅ CAMPAIGN COMPLETE: {m_name}")
-        print(f"   -> Physics Profile: {physics_cfg['torque_physics']}")
-        print(f"   -> Software: {sw_stack['stack_design'].get('operating_system')}")
-        print("---------------------------------------------------")
+    for result in await asyncio.gather(*usd_tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            print(f"\n❌ USD export failed: {result!r}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="always call the LLM, ignoring llm_cache/")
+    args = parser.parse_args()
+    llm_cache.set_enabled(not args.no_cache)
     asyncio.run(main())
\ No newline at end of file
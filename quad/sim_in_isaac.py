@@ -14,6 +14,8 @@ import os
 # --- CONFIGURATION ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 USD_EXPORT_DIR = os.path.join(CURRENT_DIR, "usd_export")
+# SKU -> prim-name-safe characters, in one translate pass
+SKU_TABLE = str.maketrans({"-": "_", " ": "_"})
 
 def main():
     world = World()
@@ -25,17 +27,17 @@ def main():
         simulation_app.close()
         return
 
-    usd_files = [f for f in os.listdir(USD_EXPORT_DIR) if f.endswith(".usda")]
-    
-    if not usd_files:
+    # Newest .usda by modification time, streamed straight off the directory
+    # listing (a single pass, no list or sort)
+    try:
+        with os.scandir(USD_EXPORT_DIR) as it:
+            newest = max((e for e in it if e.name.endswith(".usda")), key=lambda e: e.stat().st_mtime)
+    except ValueError:
         print(f"❌ Error: No USD files found in {USD_EXPORT_DIR}. Run forge.py first.")
         simulation_app.close()
         return
 
-    # Sort by modification time (newest first)
-    usd_files.sort(key=lambda x: os.path.getmtime(os.path.join(USD_EXPORT_DIR, x)), reverse=True)
-    
-    target_filename = usd_files[0]
+    target_filename = newest.name
     sku = target_filename.replace(".usda", "")
     usd_path = os.path.join(USD_EXPORT_DIR, target_filename)
     
@@ -43,7 +45,7 @@ def main():
     print(f"    PATH: {usd_path}")
 
     # --- 2. ADD TO STAGE ---
-    safe_sku = sku.replace("-", "_").replace(" ", "_")
+    safe_sku = sku.translate(SKU_TABLE)
     prim_path = f"/World/{safe_sku}"
     
     add_reference_to_stage(usd_path=usd_path, prim_path=prim_path)